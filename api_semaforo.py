@@ -0,0 +1,163 @@
+# --- CLIENTE HTTP DE LA API PHP (api_semaforo.php) ---
+# Una única sesión con conexiones persistentes para todas las llamadas "accion=..."
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tiempos import medir
+
+API_URL_PRODUCCION = "https://ehclegislacionymarketing.es/api_semaforo.php"
+# Permite apuntar la app a otra API (p. ej. servidor_local.py) sin tocar el código
+API_URL = os.environ.get("SEMAFORO_API_URL", API_URL_PRODUCCION)
+
+# Acciones de solo lectura: se pueden reintentar sin riesgo de duplicar escrituras
+ACCIONES_LECTURA = {"festivos", "clientes", "usuarios"}
+
+# (conexión, lectura) en segundos
+TIMEOUTS = {
+    "festivos": (3.05, 10),
+    "usuarios": (3.05, 10),
+    "clientes": (3.05, 30),
+}
+TIMEOUT_POR_DEFECTO = (3.05, 15)
+
+REINTENTOS = 3
+ESPERA_BASE = 0.5  # segundos; se duplica en cada reintento
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+# Con estas respuestas el servidor (o el proxy) pudo aplicar la escritura antes de fallar
+ESTADOS_DUDOSOS = {500, 502, 504}
+
+# Acciones por lotes → (clave con la lista, acción de una fila que las sustituye
+# mientras el backend no las tenga)
+ACCIONES_LOTE = {
+    "insertar_clientes": ("filas", "insertar_cliente"),
+    "actualizar_productos": ("cambios", "actualizar_producto"),
+}
+
+
+class ErrorAPI(Exception):
+    def __init__(self, accion, mensaje, status=None):
+        super().__init__(f"[{accion}] {mensaje}")
+        self.accion = accion
+        self.status = status
+
+    @property
+    def rechazada(self):
+        # El servidor contestó y no aplicó la petición. Sin status (timeout, conexión
+        # cortada, lote a medias) o con un status dudoso no se sabe qué se ha guardado:
+        # no se debe repetir.
+        return self.status is not None and self.status not in ESTADOS_DUDOSOS
+
+
+class ClienteAPI:
+    def __init__(self, url=API_URL, reintentos=REINTENTOS, espera_base=ESPERA_BASE):
+        self.url = url
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+        self.sesion.mount("https://", adaptador)
+        self.sesion.mount("http://", adaptador)
+        # acción por lotes → ¿la conoce el backend? (se pregunta una vez)
+        self.lotes = {}
+
+    def llamar(self, datos, como_json=True):
+        # datos incluye la clave "accion"; se envía como JSON o como formulario
+        accion = datos.get("accion", "")
+        with medir(f"api:{accion}", "api", accion=accion) as etapa:
+            return self._llamar(accion, datos, como_json, etapa)
+
+    def _llamar(self, accion, datos, como_json, etapa):
+        timeout = TIMEOUTS.get(accion, TIMEOUT_POR_DEFECTO)
+        intentos = self.reintentos if accion in ACCIONES_LECTURA else 1
+        cuerpo = {"json": datos} if como_json else {"data": datos}
+
+        for intento in range(intentos):
+            ultimo = intento == intentos - 1
+            etapa["intentos"] = intento + 1
+            try:
+                respuesta = self.sesion.post(self.url, timeout=timeout, **cuerpo)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if ultimo:
+                    raise ErrorAPI(accion, f"sin respuesta del servidor: {e}") from e
+                self._esperar(intento)
+                continue
+            except requests.RequestException as e:
+                raise ErrorAPI(accion, str(e)) from e
+
+            etapa["status"] = respuesta.status_code
+            if respuesta.status_code in ESTADOS_REINTENTABLES and not ultimo:
+                self._esperar(intento)
+                continue
+            if respuesta.status_code >= 400:
+                raise ErrorAPI(accion, f"HTTP {respuesta.status_code}: {respuesta.text[:200]}", respuesta.status_code)
+
+            return self._decodificar(accion, respuesta)
+
+    def consultar(self, accion, **parametros):
+        return self.llamar({"accion": accion, **parametros}, como_json=False)
+
+    def admite_lotes(self, accion):
+        # Se pregunta con un lote vacío, que no escribe nada: cualquier error con
+        # respuesta del servidor es que no la conoce. Un error de red no se recuerda y
+        # se volverá a preguntar en la siguiente escritura.
+        if accion not in self.lotes:
+            clave, _ = ACCIONES_LOTE[accion]
+            try:
+                self._llamar_lote(accion, clave, [])
+                self.lotes[accion] = True
+            except ErrorAPI as e:
+                if e.status is None:
+                    raise
+                self.lotes[accion] = False
+        return self.lotes[accion]
+
+    def insertar_clientes(self, filas):
+        # Todas las filas (de uno o varios clientes) en una sola petición; el
+        # servidor las guarda en una transacción, así que o entran todas o ninguna.
+        # Sin la acción por lotes se envían con insertar_cliente, una a una.
+        if self.admite_lotes("insertar_clientes"):
+            return self._llamar_lote("insertar_clientes", "filas", filas)
+        return self._por_filas("insertar_clientes", filas)
+
+    def actualizar_productos(self, cambios):
+        # Varios cambios de ✔/❌ (cada uno con su producto, valor, semaforo, cliente y dia)
+        # en una sola petición, o con actualizar_producto si el backend no la tiene
+        if self.admite_lotes("actualizar_productos"):
+            return self._llamar_lote("actualizar_productos", "cambios", cambios)
+        return self._por_filas("actualizar_productos", cambios)
+
+    def _llamar_lote(self, accion, clave, elementos):
+        with medir(f"api:{accion}", "api", accion=accion, elementos=len(elementos)) as etapa:
+            respuesta = self._llamar(accion, {"accion": accion, clave: elementos}, True, etapa)
+        if not isinstance(respuesta, dict) or respuesta.get("status") != "ok":
+            raise ErrorAPI(accion, f"petición rechazada: {respuesta}", etapa.get("status"))
+        return respuesta
+
+    def _por_filas(self, accion, elementos):
+        # Sin transacción: si falla una fila después de la primera, las anteriores
+        # ya están guardadas y el error sale sin status (resultado desconocido)
+        _, accion_fila = ACCIONES_LOTE[accion]
+        for n, elemento in enumerate(elementos):
+            try:
+                self.llamar({"accion": accion_fila, **elemento})
+            except ErrorAPI as e:
+                if n == 0:
+                    raise
+                raise ErrorAPI(accion, f"guardadas {n} de {len(elementos)} filas: {e}") from e
+        return {"status": "ok", "por_filas": len(elementos)}
+
+    def _decodificar(self, accion, respuesta):
+        try:
+            return respuesta.json()
+        except ValueError as e:
+            # Las escrituras pueden responder texto plano; las lecturas deben ser JSON
+            if accion in ACCIONES_LECTURA:
+                raise ErrorAPI(accion, f"respuesta no válida: {respuesta.text[:200]}", respuesta.status_code) from e
+            return respuesta.text
+
+    def _esperar(self, intento):
+        time.sleep(self.espera_base * (2 ** intento))
@@ -3,9 +3,100 @@ import streamlit as st
 import pandas as pd
 import os
 import io
-import requests  # ✅ Para conectarse a la API PHP
+import logging
 from datetime import datetime, timedelta
 
+from api_semaforo import API_URL, ClienteAPI
+from busqueda import IndiceClientes
+from calendario import calendario_laboral, dias_habiles_serie, guardar_festivos, leer_festivos
+from exportacion import (
+    EN_CURSO,
+    ERROR as ERROR_EXPORTACION,
+    FORMATOS,
+    PENDIENTE,
+    SIN_CAMBIOS,
+    TERMINADO,
+    ExportadorSegundoPlano,
+    exportar_temporal,
+    formatos_disponibles,
+    hash_contenido,
+)
+from importacion import (
+    ERROR as ERROR_IMPORTACION,
+    IMPORTADO,
+    SIN_CONFIRMAR,
+    enviar_importacion,
+    leer_filas,
+    preparar_importacion,
+)
+from metricas import publicar_metricas
+from semaforo import (
+    COLUMNAS_BASE,
+    FILTROS_VACIOS,
+    MARCA_NO,
+    MARCA_SI,
+    PRODUCTOS,
+    actualizar_semaforo as calcular_semaforo,
+    actualizar_semaforo_cliente,
+    anadir_flags,
+    aplicar_filtros,
+    cambios_edicion,
+    clientes_en_semaforo,
+    detectar_expirados,
+    estandarizar_fechas,
+    fijar_flag,
+    fila_insercion,
+    filas_nuevo_cliente,
+    filtrar_clientes,
+    heredar_flags,
+    igual_a,
+    normalizar_categorias,
+    paginar_clientes,
+    preparar_semaforo,
+    productos_editables,
+    productos_marcados,
+    tabla_edicion,
+    total_paginas,
+    valor_flag,
+)
+from sincronizacion import InstantaneaClientes
+from tiempos import (
+    COLORES_CATEGORIA,
+    anotar,
+    configurar_registro,
+    filas_cascada,
+    finalizar_rerun,
+    iniciar_rerun,
+    medir,
+    totales_por_categoria,
+)
+
+# --- TIEMPOS DEL RERUN (API, etapas de datos y pintado) ---
+configurar_registro()
+try:
+    # 📈 Histogramas del proceso en formato Prometheus (SEMAFORO_METRICAS_PUERTO / _FICHERO)
+    publicar_metricas()
+except OSError as e:
+    logging.getLogger(__name__).warning("⚠️ No se pudo abrir el puerto de métricas: %s", e)
+medicion_anterior = st.session_state.get("medicion_rerun")
+if medicion_anterior is not None and medicion_anterior.total_ms is None:
+    # El rerun anterior terminó sin pasar por detener()/relanzar() (p. ej. una excepción)
+    medicion_anterior.finalizar(tarde=True, interrumpido=True)
+medicion = iniciar_rerun()
+st.session_state.medicion_rerun = medicion
+
+
+def detener():
+    # ⏱️ st.stop() cerrando antes la medición, con la duración real del rerun
+    finalizar_rerun(interrumpido=True)
+    st.stop()
+
+
+def relanzar():
+    # ⏱️ st.rerun() cerrando antes la medición
+    finalizar_rerun(interrumpido=True)
+    st.rerun()
+
 # --- CONFIGURACIÓN ---
 st.set_page_config(page_title="Ruta Semáforo: Del Contacto al Cierre", page_icon="🚦", layout="wide")
 st.title("🚦 Ruta Semáforo: Del Contacto al Cierre")
@@ -19,171 +110,276 @@ colores_semaforo = {
     "": ("#F2F2F2", "#000000")
 }
 
-# --- API URL ---
-API_URL = "https://ehclegislacionymarketing.es/api_semaforo.php"
+# --- CLIENTE DE LA API (sesión compartida con conexiones persistentes) ---
+@st.cache_resource
+def obtener_api():
+    return ClienteAPI(API_URL)
 
-# --- Obtener festivos desde API ---
-def obtener_festivos():
-    try:
-        response = requests.post(API_URL, data={"accion": "festivos"})
-        response.raise_for_status()
+api = obtener_api()
 
-        fechas_json = response.json()
+# --- Obtener festivos desde API (una vez por proceso, con copia local) ---
+FESTIVOS_TTL = 24 * 3600  # segundos
+FESTIVOS_RESPALDO = "festivos_respaldo.json"
 
-        if not isinstance(fechas_json, list) or not fechas_json:
-            return set()
+@st.cache_data(ttl=FESTIVOS_TTL, show_spinner=False)
+def descargar_festivos():
+    fechas_json = api.consultar("festivos")
+
+    if not isinstance(fechas_json, list) or not fechas_json:
+        raise ValueError("la API no ha devuelto ningún festivo")
+
+    fechas = {pd.to_datetime(f).date() for f in fechas_json}
+    try:
+        guardar_festivos(FESTIVOS_RESPALDO, fechas)
+    except OSError:
+        pass  # Sin copia local seguimos con los festivos recién descargados
+    return fechas
 
-        fechas = set([pd.to_datetime(f).date() for f in fechas_json])
-        return fechas
 
+def obtener_festivos():
+    try:
+        return descargar_festivos()
     except Exception as e:
-        return set()
+        # 💾 Si la API falla usamos la última copia guardada, avisando
+        fechas = leer_festivos(FESTIVOS_RESPALDO)
+        if fechas:
+            st.warning(f"⚠️ No se pudieron cargar los festivos desde la API ({e}). Usando la copia local.")
+        else:
+            st.error(f"❌ No se pudieron cargar los festivos desde la API ({e}) y no hay copia local: no se descontarán festivos.")
+        return fechas
 
 # Cargar festivos desde API
 festivos = obtener_festivos()
+# 📅 Calendario laboral precalculado, compartido por todos los cálculos de fechas
+calendario = calendario_laboral(festivos)
 
 # --- FUNCIONES GLOBALES ---
-def calcular_dia_habil(fecha, festivos):
-    while fecha.weekday() >= 5 or fecha in festivos:
-        fecha += timedelta(days=1)
-    return fecha
-
-def dias_habiles(fecha_entrada):
-    if pd.isna(fecha_entrada):
-        return 0
-    try:
-        fecha = pd.to_datetime(fecha_entrada).date()
-        hoy = datetime.now().date()
-        dias = 0
-        while fecha <= hoy:
-            if fecha.weekday() < 5 and fecha not in festivos:
-                dias += 1
-            fecha += timedelta(days=1)
-        return dias
-    except Exception:
-        return 0
+def dias_habiles(fechas_entrada):
+    # 📆 Días hábiles transcurridos para toda la columna de una vez
+    return dias_habiles_serie(fechas_entrada, calendario)
 
 
         
     
 def insertar_cliente(cal, comercial, cliente, fecha_entrada=None):
     if fecha_entrada is None:
-        fecha_entrada = calcular_dia_habil(datetime.now().date(), festivos)
-
-    fecha = fecha_entrada
-    filas = []
-    for i in range(3):
-        fila = {
-            "CAL": cal,
-            "COMERCIAL": comercial,
-            "CLIENTE": cliente,
-            "DIA": fecha,
-            **{p: "❌" for p in productos},
-            "SEMAFORO": "",
-            "FECHA_ENTRADA": fecha_entrada  # 🔧 Aquí va en las 3 filas
-        }
-        filas.append(fila)
-        fecha = calcular_dia_habil(fecha + timedelta(days=1), festivos)
+        fecha_entrada = calendario.siguiente_habil(datetime.now().date())
+
+    filas = [
+        {**{p: "❌" for p in productos}, "SEMAFORO": "", **fila}
+        for fila in filas_nuevo_cliente(cal, comercial, cliente, fecha_entrada, calendario)
+    ]
     return pd.DataFrame(filas)
 
 
+def filas_insercion(nuevo):
+    # 📦 Filas de insertar_cliente en el formato que espera la API
+    return [fila_insercion(fila) for _, fila in nuevo.iterrows()]
+
+
 def actualizar_semaforo(df):
-    hoy = datetime.now().date()
-    df = df.copy()
+    # 🚦 Cálculo vectorizado de todo el semáforo en una sola pasada
+    return calcular_semaforo(df, productos)
 
-    # ✅ Asegurar que la columna DIA existe
-    if "DIA" not in df.columns:
-        df["DIA"] = pd.NaT
 
-    df["DIA"] = pd.to_datetime(df["DIA"], errors="coerce").dt.date
+def limpiar_clientes_expirados(df_visible, clientes_eliminar, rojos):
+    # 💾 Exporta los ROJOS vencidos de toda la tabla (`rojos`: DataFrame y hash, de
+    # rojos_coordinacion) y devuelve `df_visible` (lo que se va a pintar) sin los expirados
+    df_rojos, valor = rojos
 
-    # 🔑 Asegurar tipo date
-    df["DIA"] = pd.to_datetime(df["DIA"], errors="coerce").dt.date
+    if not df_rojos.empty:
+        # Son los ROJOS de todos los coordinadores: el archivo es del día, no del usuario
+        nombre_archivo = f"{CARPETA_ROJOS}/ROJOS_{datetime.now().date()}.xlsx"
+        # 🧵 Solo se encola si cambia el hash de la versión de datos (o falló la última vez)
+        exportador = obtener_exportador()
+        trabajo = exportador.trabajo(nombre_archivo)
+        if trabajo is None or trabajo["hash"] != valor or trabajo["estado"] == ERROR_EXPORTACION:
+            trabajo = exportador.exportar(df_rojos, nombre_archivo, valor)
+        mostrar_estado_exportacion(nombre_archivo, trabajo)
 
-    for cliente in df["CLIENTE"].unique():
-        bloque = df[df["CLIENTE"] == cliente].sort_values("DIA")
-        if len(bloque) < 3:
-            continue  # No tiene 3 días aún, no puede evaluarse
+    # ❌ OJO: NO borramos del Excel original, solo los ocultamos en Coordinación
+    return df_visible[~df_visible["CLIENTE"].isin(clientes_eliminar)]
+
+@st.cache_resource
+def obtener_exportador():
+    return ExportadorSegundoPlano()
+
+
+def ofrecer_descarga(df, nombre_base, clave):
+    # 📥 El archivo se genera solo al pedirlo (escritura en streaming a un temporal)
+    # y se guarda en la sesión hasta que cambie el formato o se vuelva a pedir
+    c1, c2, c3 = st.columns([1, 1, 3])
+    formato = c1.selectbox("Formato", formatos_disponibles(), key=f"{clave}_formato")
+    preparada = st.session_state.get(f"{clave}_descarga")
+    if c2.button("📦 Preparar exportación", key=f"{clave}_preparar"):
+        with medir(f"exportar:{clave}", "datos", formato=formato, filas=len(df)):
+            with exportar_temporal(df, formato) as archivo:
+                preparada = {"formato": formato, "nombre": nombre_base, "datos": archivo.read()}
+        st.session_state[f"{clave}_descarga"] = preparada
+
+    if preparada and (preparada["formato"], preparada["nombre"]) == (formato, nombre_base):
+        c3.download_button(
+            f"⬇️ Descargar {formato.upper()}",
+            data=preparada["datos"],
+            file_name=f"{nombre_base}.{formato}",
+            mime=FORMATOS[formato][0],
+            key=f"{clave}_descargar"
+        )
 
-        # Extraemos índices de los 3 días clave
-        idxs = bloque.index.tolist()
-        checks = bloque[productos].applymap(lambda x: x == "✔").sum(axis=1)
-        cruces = bloque[productos].applymap(lambda x: x == "❌").sum(axis=1)
 
-        # AZUL - todos ✔ en cualquier fila
-        if any(checks == len(productos)):
-            for idx in bloque.index:
-                if df.at[idx, "DIA"] <= hoy:
-                    df.at[idx, "SEMAFORO"] = "AZUL - FINALIZADO"
-                else:
-                    df.at[idx, "SEMAFORO"] = ""
-            continue
+def importar_clientes(indice):
+    # 📥 Alta masiva desde CSV / Excel: validar, deduplicar y enviar por lotes
+    with st.expander("📥 Importar clientes desde CSV o Excel", expanded=False):
+        st.caption("Columnas: COMERCIAL y CLIENTE (obligatorias) y CAL (si falta, se usa tu usuario).")
+        with st.form("importar_clientes", clear_on_submit=True):
+            archivo = st.file_uploader("Archivo", type=["csv", "xlsx"], key="archivo_importacion")
+            forzar = st.checkbox("Importar también los que se parecen a clientes existentes", key="forzar_importacion")
+            enviar = st.form_submit_button("📥 Importar")
 
-        # VERDE - 1er día con al menos 1 ✔
-        if df.at[idxs[0], "DIA"] <= hoy and checks.iloc[0] >= 1:
-            df.at[idxs[0], "SEMAFORO"] = "VERDE"
+        if enviar and archivo is not None:
+            try:
+                with medir("importar:validar", "datos", archivo=archivo.name):
+                    clientes, informe = preparar_importacion(
+                        leer_filas(archivo, archivo.name), indice, st.session_state.usuario,
+                        usuarios=usuarios_dict.keys(), forzar=forzar
+                    )
+                    anotar(filas=len(informe), validos=len(clientes))
+            except Exception as e:
+                st.error(f"❌ No se pudo leer el archivo: {e}")
+                return
+
+            importados = 0
+            if clientes:
+                barra = st.progress(0.0, text=f"Enviando {len(clientes)} clientes…")
+                with medir("importar:enviar", "datos", clientes=len(clientes)):
+                    importados = enviar_importacion(
+                        api, clientes, informe, calendario.siguiente_habil(datetime.now().date()), calendario,
+                        progreso=lambda hechos, total: barra.progress(hechos / total, text=f"Enviados {hechos} de {total} clientes")
+                    )
+                invalidar_clientes()
+            st.session_state.informe_importacion = {"nombre": archivo.name, "importados": importados, "filas": informe}
+
+        resultado = st.session_state.get("informe_importacion")
+        if resultado:
+            df_informe = pd.DataFrame(resultado["filas"], columns=["FILA", "CLIENTE", "ESTADO", "MOTIVO"])
+            errores = int((df_informe["ESTADO"] == ERROR_IMPORTACION).sum())
+            st.success(f"✅ {resultado['nombre']}: {resultado['importados']} clientes importados de {len(df_informe)} filas.")
+            sin_confirmar = int((df_informe["ESTADO"] == SIN_CONFIRMAR).sum())
+            if errores:
+                st.warning(f"⚠️ {errores} filas con error.")
+            if sin_confirmar:
+                st.warning(f"⚠️ {sin_confirmar} clientes sin confirmar: la API no respondió y pueden haberse guardado. Revísalos antes de volver a importarlos.")
+            pendientes = df_informe[df_informe["ESTADO"] != IMPORTADO]
+            if not pendientes.empty:
+                st.dataframe(pendientes, use_container_width=True, hide_index=True)
+            ofrecer_descarga(df_informe, f"informe_{resultado['nombre'].rsplit('.', 1)[0]}", "informe_importacion")
+
+
+def mostrar_estado_exportacion(nombre_archivo, trabajo):
+    estado = trabajo["estado"]
+    if estado in (PENDIENTE, EN_CURSO):
+        st.info(f"⏳ Exportando {trabajo['filas']} filas ROJO en segundo plano ({estado}): {nombre_archivo}")
+    elif estado in (TERMINADO, SIN_CAMBIOS):
+        if estado == TERMINADO:
+            st.success(f"📤 Clientes ROJO exportados: {nombre_archivo}")
+        else:
+            st.caption(f"📤 ROJOS sin cambios desde la última exportación: {nombre_archivo}")
+        with open(nombre_archivo, "rb") as f:
+            st.download_button(
+                "⬇️ Descargar ROJOS",
+                data=f,
+                file_name=os.path.basename(nombre_archivo),
+                mime=FORMATOS["xlsx"][0],
+                key="descargar_rojos"
+            )
+    else:
+        st.error(f"❌ No se pudieron exportar los ROJOS a {nombre_archivo}: {trabajo['error']}")
 
-        # AMARILLO - 2º día con al menos 1 ❌
-        if df.at[idxs[1], "DIA"] <= hoy and cruces.iloc[1] >= 1:
-            df.at[idxs[1], "SEMAFORO"] = "AMARILLO"
+# --- PAGINACIÓN DEL SEMÁFORO (solo se dibujan los clientes de la página actual) ---
+OPCIONES_POR_PAGINA = [10, 25, 50, 100]
 
-        # ROJO - 3er día:
-        #     🔴 Si tiene algún ❌
-        #     🔴 O si no hay ningún ✔ (bloque en blanco también)
-        if df.at[idxs[2], "DIA"] <= hoy:
-            if cruces.iloc[2] >= 1 or checks.iloc[2] == 0:
-                df.at[idxs[2], "SEMAFORO"] = "ROJO"
+def seleccionar_pagina(df_visible, clave):
+    c1, c2, c3 = st.columns([1, 1, 4])
+    por_pagina = c1.selectbox("Clientes por página", OPCIONES_POR_PAGINA, index=1, key=f"{clave}_por_pagina")
+    paginas = total_paginas(df_visible, por_pagina)
 
-    return df.fillna("")
+    # Si cambian los filtros o el tamaño, la página guardada puede quedar fuera de rango
+    clave_pagina = f"{clave}_pagina"
+    if st.session_state.get(clave_pagina, 1) > paginas:
+        st.session_state[clave_pagina] = paginas
 
-    
-    
-def estandarizar_fechas(df):
-    if "DIA" in df.columns:
-        df["DIA"] = pd.to_datetime(df["DIA"], errors="coerce").dt.date
-    else:
-        df["DIA"] = pd.NaT
+    pagina = c2.number_input("Página", min_value=1, max_value=paginas, step=1, key=clave_pagina)
+    c3.markdown(f"<div style='padding-top:2.1rem'>Página {pagina} de {paginas} — {df_visible['CLIENTE'].nunique()} clientes</div>", unsafe_allow_html=True)
+    return paginar_clientes(df_visible, pagina, por_pagina)
 
-    if "FECHA_ENTRADA" in df.columns:
-        df["FECHA_ENTRADA"] = pd.to_datetime(df["FECHA_ENTRADA"], errors="coerce")
-    else:
-        df["FECHA_ENTRADA"] = pd.NaT
 
-    return df
+# --- EDICIÓN EN TABLA: todos los ✔/❌ del día en un solo envío ---
+def estilo_semaforo(valor):
+    bg, fg = colores_semaforo.get(valor, colores_semaforo[""])
+    return f"background-color:{bg}; color:{fg}"
 
 
-def limpiar_clientes_expirados(df):
+def editar_semaforo_tabla(df, df_pagina):
     hoy = datetime.now().date()
-    clientes_eliminar = []
-
-    for cliente in df["CLIENTE"].unique():
-        bloque = df[df["CLIENTE"] == cliente].sort_values("DIA")
-        if len(bloque) < 3:
-            continue
-        primer_dia = bloque.iloc[0]["DIA"]
-        fecha_limite = primer_dia
-        for _ in range(3):
-            fecha_limite = calcular_dia_habil(fecha_limite + timedelta(days=1), festivos)
-        if hoy >= fecha_limite:
-            clientes_eliminar.append(cliente)
-
-    # 💾 Exportamos los ROJOS vencidos si no han sido ya exportados
-    df_rojos = df[
-        (df["CLIENTE"].isin(clientes_eliminar)) &
-        (df["SEMAFORO"] == "ROJO") &
-        ((df["ASIGNADO_CLOSER"].isna()) | (df["ASIGNADO_CLOSER"] == ""))
-    ]
+    editables = df_pagina[df_pagina["DIA"] == hoy]
+    otros = df_pagina[df_pagina["DIA"] != hoy]
 
-    if not df_rojos.empty:
-        # ✅ Corregimos la columna para asegurar que FECHA_ENTRADA esté presente
-        df_rojos["FECHA_ENTRADA"] = pd.to_datetime(df_rojos["FECHA_ENTRADA"], errors="coerce")
-        nombre_archivo = f"{CARPETA_ROJOS}/ROJOS_{usuario_actual}_{hoy}.xlsx"
-        df_rojos.to_excel(nombre_archivo, index=False)
-        st.success(f"📤 Clientes ROJO exportados: {nombre_archivo}")
+    if editables.empty:
+        st.info("📭 Ningún cliente de esta página tiene hoy un día editable.")
+    else:
+        # Solo las filas de hoy son editables; el formulario evita un rerun por casilla
+        original = tabla_edicion(editables, productos)
+        casillas = productos_editables(productos)
+        with st.form("form_semaforo_tabla"):
+            editado = st.data_editor(
+                original,
+                key="semaforo_tabla",
+                use_container_width=True,
+                hide_index=True,
+                disabled=[c for c in original.columns if c not in casillas],
+                column_config={p: st.column_config.CheckboxColumn(p) for p in casillas}
+            )
+            guardar = st.form_submit_button("💾 Guardar cambios")
+
+        if guardar:
+            cambios = cambios_edicion(original, editado, productos)
+            if not cambios:
+                st.info("ℹ️ No hay cambios que guardar.")
+            else:
+                for i, p, valor in cambios:
+                    fijar_flag(df, i, p, valor)
+                # La página trae siempre clientes completos: basta con buscar en ella
+                for cliente in {df.at[i, "CLIENTE"] for i, _, _ in cambios}:
+                    actualizar_semaforo_cliente(df, df_pagina.index[df_pagina["CLIENTE"] == cliente], productos)
+
+                try:
+                    api.actualizar_productos([
+                        {
+                            "producto": p,
+                            "valor": valor,
+                            "semaforo": df.at[i, "SEMAFORO"],
+                            "cliente": df.at[i, "CLIENTE"],
+                            "dia": df.at[i, "DIA"].strftime("%Y-%m-%d")
+                        }
+                        for i, p, valor in cambios
+                    ])
+                except Exception as e:
+                    # Se descarta el cambio local: la próxima lectura trae lo que hay en la API
+                    invalidar_clientes()
+                    st.error(f"❌ Error al actualizar en la API: {e}")
+                else:
+                    cambios_guardados()
+                    relanzar()
+
+    if not otros.empty:
+        st.caption("📅 Resto de días de estos clientes (solo lectura)")
+        columnas = ["CAL", "COMERCIAL", "CLIENTE", "DIA"] + productos + ["SEMAFORO"]
+        st.dataframe(
+            otros[columnas].style.map(estilo_semaforo, subset=["SEMAFORO"]),
+            use_container_width=True,
+            hide_index=True
+        )
 
-    # ❌ OJO: NO borramos del Excel original, solo los ocultamos en Coordinación
-    df_filtrado = df[~df["CLIENTE"].isin(clientes_eliminar)]
-    return df_filtrado
 
 # --- VARIABLES GLOBALES ---
 CARPETA_ROJOS = "ROJOS_PENDIENTES"
@@ -194,79 +390,65 @@ os.makedirs(CARPETA_ROJOS, exist_ok=True)
 
 
 # --- DEFINIR ESTRUCTURA BASE (sin Excel) ---
-columnas_base = [
-    "CAL", "COMERCIAL", "CLIENTE", "DIA", "SEMAFORO",
-    "FECHA_ENTRADA", "ASIGNADO_CLOSER", "FECHA_ASIGNACION_CLOSER",
-    "ASIGNADO_SUPERCLOSER", "FECHA_ASIGNACION_SUPERCLOSER",
-    "ESTADO_CIERRE", "SEGUIMIENTO_CLOSER", "SEGUIMIENTO_SUPERCLOSER",
-    "F2025", "F2026", "HL",
-    "CLOSER_F2025", "CLOSER_F2026", "CLOSER_HL",
-    "SUPERCLOSER_F2025", "SUPERCLOSER_F2026", "SUPERCLOSER_HL"
-]
-
-
-# --- Cargar días festivos desde API PHP ---
-import requests
-
-API_URL = "https://ehclegislacionymarketing.es/api_semaforo.php"
-
-
-# Llamada real
-festivos = obtener_festivos()
+columnas_base = COLUMNAS_BASE
 
 
 # --- Definir productos globales ---
-excluidos = ["CAL", "COMERCIAL", "CLIENTE", "DIA", "SEMAFORO", "CLOSER", "OBSERVACIONES CLOSER", "OBSERVACIONES SUPER-CLOSER", "ESTADO FINAL"]
-productos = [col for col in columnas_base if col not in excluidos]
-
-# --- Cargar clientes desde la API PHP ---
-try:
-    response = requests.post(API_URL, data={"accion": "clientes"})
-    response.raise_for_status()
-    datos_clientes = response.json()
+productos = PRODUCTOS
+
+# --- Cargar clientes desde la API PHP (con caché compartida entre reruns) ---
+CLIENTES_TTL = 300  # segundos
+
+@st.cache_resource
+def obtener_instantanea():
+    # 💾 Copia de la tabla compartida por todo el proceso; se actualiza por deltas
+    return InstantaneaClientes(api)
+
+
+@st.cache_data(ttl=CLIENTES_TTL, show_spinner=False)
+def consultar_clientes(**filtros):
+    # 🔎 Filtros opcionales (rol, asignado, cal, desde, hasta, estado) que se envían a la API;
+    # si el servidor no los soporta se aplican aquí igualmente
+    anotar(cache="fallo")
+    filtros = {k: v for k, v in filtros.items() if v}
+    instantanea = obtener_instantanea()
+    if filtros and not instantanea.cargada:
+        df = pd.DataFrame(api.consultar("clientes", **filtros))
+    else:
+        df = instantanea.sincronizar()
+    # ✔/❌ decodificados a bits y columnas de texto repetitivas como categorías,
+    # una vez por versión de datos
+    df = normalizar_categorias(anadir_flags(df.copy()))
+    return filtrar_clientes(df, **filtros)
 
-    df = pd.DataFrame(datos_clientes)
 
-    if df.empty:
-        st.warning("📭 No hay datos de clientes disponibles.")
-    else:
-        df = estandarizar_fechas(df)
-        df["CAL"] = df["CAL"].astype(str).str.strip().str.upper()
-        df["COMERCIAL"] = df["COMERCIAL"].astype(str).str.strip()
-        df["CLIENTE"] = df["CLIENTE"].astype(str).str.strip()
+def cargar_clientes(**filtros):
+    # ⏱️ Se mide fuera de la caché para ver también lo que cuesta un acierto
+    with medir("cargar_clientes", "datos", cache="acierto", **{k: v for k, v in filtros.items() if v}) as etapa:
+        df = consultar_clientes(**filtros)
+        etapa["filas"] = len(df)
+        return df
 
-        columnas_requeridas = ["FECHA_ENTRADA", "DIA"]
-        for col in columnas_requeridas:
-            if col not in df.columns:
-                st.error(f"❌ Falta la columna obligatoria: {col}")
-                st.stop()
 
-        df["FECHA_ENTRADA"] = pd.to_datetime(df["FECHA_ENTRADA"], errors="coerce").dt.date
-        df["DIA"] = pd.to_datetime(df["DIA"], errors="coerce").dt.date
+def cambios_guardados():
+    # ✔/❌ ya aplicados en el sitio sobre el semáforo compartido: el semáforo, su índice
+    # y los expirados siguen valiendo; solo se refresca la lectura (delta) de las demás vistas
+    consultar_clientes.clear()
 
-        if df["FECHA_ENTRADA"].isna().any():
-            st.warning("⚠️ Hay filas con FECHA_ENTRADA vacía.")
-        if df["DIA"].isna().any():
-            st.warning("⚠️ Hay filas con DIA vacía.")
 
-except Exception as e:
-    st.error(f"❌ Error al cargar clientes desde la API: {e}")
-    df = pd.DataFrame(columns=columnas_base)
-    for col in [
-        "ASIGNADO_CLOSER", "FECHA_ASIGNACION_CLOSER", "FECHA_ENTRADA",
-        "ASIGNADO_SUPERCLOSER", "FECHA_ASIGNACION_SUPERCLOSER",
-        "ESTADO_CIERRE", "SEGUIMIENTO_CLOSER", "SEGUIMIENTO_SUPERCLOSER"
-    ]:
-        if col not in df.columns:
-            df[col] = ""
-    df["FECHA_ENTRADA"] = pd.to_datetime(df["FECHA_ENTRADA"], errors="coerce")
+def invalidar_clientes():
+    # 🔄 Tras cualquier escritura en la API la próxima lectura pide solo los cambios
+    consultar_clientes.clear()
+    semaforo_coordinacion.clear()
+    indice_coordinacion.clear()
+    expirados_coordinacion.clear()
+    rojos_coordinacion.clear()
+    fechas_vacias_coordinacion.clear()
 
 
 # --- LECTURA DE USUARIOS DESDE API PHP ---
 try:
-    response = requests.post(API_URL, data={"accion": "usuarios"})
-    response.raise_for_status()
-    datos_usuarios = response.json()
+    datos_usuarios = api.consultar("usuarios")
 
     df_usuarios = pd.DataFrame(datos_usuarios)
 
@@ -280,7 +462,7 @@ try:
 
 except Exception as e:
     st.error(f"❌ No se pudo cargar la tabla de usuarios desde la API: {e}")
-    st.stop()
+    detener()
 
 # --- LOGIN LIBRE Y ROL DINÁMICO ---
 if "usuario" not in st.session_state:
@@ -295,13 +477,14 @@ if not st.session_state.usuario:
         if usuario in usuarios_dict and usuarios_dict[usuario]["clave"] == clave:
             st.session_state.usuario = usuario
             st.session_state.rol = usuarios_dict[usuario]["rol"].upper()
-            st.rerun()
+            relanzar()
         else:
             st.error("❌ Usuario o contraseña incorrectos")
-    st.stop()
+    detener()
 
 usuario_actual = st.session_state.usuario.strip().upper()
 rol_actual = st.session_state.rol
+medicion.etiquetar(usuario=usuario_actual, rol=rol_actual)
 
 # --- BARRA DE USUARIO DISCRETA ARRIBA A LA DERECHA ---
 with st.container():
@@ -313,7 +496,7 @@ with st.container():
         if cambiar:
             st.session_state.usuario = ""
             st.session_state.rol = ""
-            st.rerun()
+            relanzar()
 
 
 
@@ -322,14 +505,247 @@ es_coordinador = rol_actual == "COORDINADOR"
 es_closer = rol_actual == "CLOSER"
 es_super = rol_actual == "SUPER"
 
+
+# --- SEMÁFORO DE COORDINACIÓN (vista compartida por Dirección y Coordinación) ---
+@st.cache_resource(ttl=CLIENTES_TTL, show_spinner=False)
+def semaforo_coordinacion(hoy, festivos_clave):
+    # 🧮 Un único cálculo por versión de datos, reutilizado en todos los reruns.
+    # Es un recurso compartido (sin copia por rerun): los ✔/❌ se aplican en el sitio
+    # con fijar_flag + actualizar_semaforo_cliente en lugar de recalcularlo entero
+    anotar(cache="fallo")
+    return preparar_semaforo(cargar_clientes(), columnas_base, productos, calendario_laboral(festivos_clave), hoy)
+
+
+@st.cache_data(ttl=CLIENTES_TTL, show_spinner=False)
+def expirados_coordinacion(hoy, festivos_clave):
+    # ⏳ Clientes con el plazo cumplido, una vez por versión de datos
+    anotar(cache="fallo")
+    clientes, _ = detectar_expirados(semaforo_coordinacion(hoy, festivos_clave), calendario_laboral(festivos_clave), hoy)
+    return clientes
+
+
+@st.cache_data(ttl=CLIENTES_TTL, show_spinner=False)
+def fechas_vacias_coordinacion(hoy, festivos_clave):
+    # ⚠️ Columnas de fecha con filas vacías (NaT), comprobadas una vez por versión de datos
+    anotar(cache="fallo")
+    df = semaforo_coordinacion(hoy, festivos_clave)
+    return [col for col in ("FECHA_ENTRADA", "DIA") if df[col].isna().any()]
+
+
+@st.cache_resource(ttl=CLIENTES_TTL, show_spinner=False)
+def rojos_coordinacion(hoy, festivos_clave):
+    # 💾 ROJOS expirados sin Closer y su hash, una vez por versión de datos (solo lectura)
+    anotar(cache="fallo")
+    df = semaforo_coordinacion(hoy, festivos_clave)
+    df_rojos = df[
+        (df["CLIENTE"].isin(expirados_coordinacion(hoy, festivos_clave))) &
+        (df["SEMAFORO"] == "ROJO") &
+        ((df["ASIGNADO_CLOSER"].isna()) | (df["ASIGNADO_CLOSER"] == ""))
+    ]
+    # ✅ Corregimos la columna para asegurar que FECHA_ENTRADA esté presente
+    df_rojos = df_rojos.assign(FECHA_ENTRADA=pd.to_datetime(df_rojos["FECHA_ENTRADA"], errors="coerce"))
+    return df_rojos, hash_contenido(df_rojos)
+
+
+@st.cache_resource(ttl=CLIENTES_TTL, show_spinner=False)
+def indice_coordinacion(hoy, festivos_clave):
+    # 🔎 Índice de búsqueda y duplicados sobre el mismo semáforo (compartido, sin copias)
+    anotar(cache="fallo")
+    return IndiceClientes(semaforo_coordinacion(hoy, festivos_clave))
+
+
+def clave_coordinacion():
+    # Clave de las cachés del semáforo de coordinación: cambia con el día y los festivos
+    return datetime.now().date(), tuple(sorted(festivos))
+
+
+def mostrar_semaforo_coordinacion():
+    try:
+        clave = clave_coordinacion()
+        with medir("semaforo_coordinacion", "datos", cache="acierto") as etapa:
+            df = semaforo_coordinacion(*clave)
+            etapa["filas"] = len(df)
+        with medir("indice_coordinacion", "datos", cache="acierto"):
+            indice = indice_coordinacion(*clave)
+        with medir("expirados_coordinacion", "datos", cache="acierto"):
+            expirados = expirados_coordinacion(*clave)
+        with medir("rojos_coordinacion", "datos", cache="acierto"):
+            rojos = rojos_coordinacion(*clave)
+        with medir("fechas_vacias_coordinacion", "datos", cache="acierto"):
+            for col in fechas_vacias_coordinacion(*clave):
+                st.warning(f"⚠️ Hay filas con {col} vacía.")
+    except Exception as e:
+        st.error(f"❌ Error al cargar los datos de clientes: {e}")
+        df = pd.DataFrame(columns=["CAL", "COMERCIAL", "CLIENTE", "FECHA_ENTRADA", "DIA", "SEMAFORO", "ASIGNADO_CLOSER"])
+        indice = IndiceClientes(df)
+        expirados = []
+        rojos = (df.iloc[:0], None)
+
+    if "filtros" not in st.session_state:
+        st.session_state.filtros = {**FILTROS_VACIOS, "CAL": st.session_state.usuario}
+
+    with st.expander("🔍 Filtros de búsqueda", expanded=False):
+        with st.form("form_filtros_aplicar"):
+            c1, c2, c3, c4 = st.columns(4)
+            CAL = c1.text_input("CAL", value=st.session_state.filtros.get("CAL", st.session_state.usuario))
+            comercial = c2.text_input("COMERCIAL", value=st.session_state.filtros.get("COMERCIAL", ""))
+            cliente = c3.text_input("CLIENTE", value=st.session_state.filtros.get("CLIENTE", ""))
+            semaforo = c4.selectbox("SEMAFORO", options=[""] + list(colores_semaforo.keys()), index=0)
+
+            if st.form_submit_button("✅ Aplicar filtros"):
+                st.session_state.filtros = {
+                    "CAL": CAL,
+                    "COMERCIAL": comercial,
+                    "CLIENTE": cliente,
+                    "SEMAFORO": semaforo
+                }
+                relanzar()
+
+        with st.form("form_filtros_borrar"):
+            if st.form_submit_button("🩹 Mostrar todos"):
+                st.session_state.filtros = dict(FILTROS_VACIOS)
+                relanzar()
+
+    df_filtrado = aplicar_filtros(df, st.session_state.filtros, indice)
+    # ⏳ Los clientes con el plazo cumplido no se muestran; sus ROJOS se exportan
+    df_filtrado = limpiar_clientes_expirados(df_filtrado, expirados, rojos)
+
+    with st.form("insertar_cliente", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        comercial = col1.text_input("Nombre del COMERCIAL", key="comercial_input")
+        cliente = col2.text_input("Nombre del CLIENTE", key="cliente_input")
+        forzar = st.checkbox("Añadir aunque se parezca a un cliente existente", key="forzar_cliente")
+
+        if st.form_submit_button("➕ Añadir Cliente"):
+            parecidos = [] if forzar else indice.parecidos(cliente)
+            if indice.existe(cliente):
+                st.warning("⚠️ Ese cliente ya existe en el semáforo.")
+            elif parecidos:
+                nombres = ", ".join(f"**{nombre}** ({puntuacion:.0%})" for nombre, puntuacion in parecidos)
+                st.warning(f"⚠️ Se parece a clientes que ya existen: {nombres}. Marca la casilla si aun así es otro cliente.")
+            else:
+                nuevo = insertar_cliente(st.session_state.usuario, comercial, cliente)
+
+                # ✅ Enviar las 3 filas en una sola petición (todo o nada)
+                try:
+                    api.insertar_clientes(filas_insercion(nuevo))
+                    st.success("✅ Cliente añadido correctamente.")
+                except Exception as e:
+                    st.error(f"❌ Fallo al guardar en la API: {e}")
+                invalidar_clientes()
+
+                st.session_state.filtros = dict(FILTROS_VACIOS)
+                relanzar()
+
+    importar_clientes(indice)
+
+    if "CLIENTE" in df_filtrado.columns and not df_filtrado.empty:
+        hoy = datetime.now().date()
+        clientes_advertidos = set()
+        df_visible = clientes_en_semaforo(df_filtrado)
+
+        if df_visible.empty:
+            st.info("📭 No hay clientes asignados a este usuario en este momento.")
+        else:
+            df_pagina = seleccionar_pagina(df_visible, "semaforo")
+
+            modo = st.radio("✏️ Modo de edición", ["Tabla", "Botones"], horizontal=True, key="modo_semaforo")
+            with medir(f"render:semaforo_{modo.lower()}", "render", filas=len(df_pagina)):
+                if modo == "Tabla":
+                    editar_semaforo_tabla(df, df_pagina)
+                else:
+                    cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
+                    cols[0].markdown("**CAL**")
+                    cols[1].markdown("**COMERCIAL**")
+                    cols[2].markdown("**CLIENTE**")
+                    cols[3].markdown("**DÍA**")
+                    for j, p in enumerate(productos):
+                        cols[4 + j].markdown(f"**{p}**")
+                    cols[-1].markdown("**SEMAFORO**")
+                    casillas = productos_editables(productos)
+
+                    for cliente, bloque in df_pagina.groupby("CLIENTE", sort=False):
+                        st.markdown("<div class='bloque-cliente-wrap'><div class='bloque-cliente-inner'>", unsafe_allow_html=True)
+                        advertir = False
+
+                        for i, fila in bloque.iterrows():
+                            cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
+                            cols[0].markdown(fila["CAL"])
+                            cols[1].markdown(fila["COMERCIAL"])
+                            cols[2].markdown(fila["CLIENTE"])
+                            cols[3].markdown(fila["DIA"].strftime("%d/%m"))
+
+                            for j, p in enumerate(productos):
+                                if p not in casillas:
+                                    # Fechas, asignaciones y estados: solo lectura
+                                    valor = fila.get(p)
+                                    cols[4 + j].markdown("" if pd.isna(valor) else valor.strftime("%d/%m/%Y") if hasattr(valor, "strftime") else str(valor))
+                                    continue
+                                label = str(fila.get(p, "❌"))
+                                if fila["DIA"] == hoy:
+                                    if cols[4 + j].button(label, key=f"{i}_{p}"):
+                                        try:
+                                            # 🔁 En el sitio: solo el bloque de este cliente (la página lo trae completo)
+                                            fijar_flag(df, i, p, MARCA_SI if valor_flag(fila, p) == MARCA_NO else MARCA_NO)
+                                            actualizar_semaforo_cliente(df, bloque.index, productos)
+                                            datos = {
+                                                "accion": "actualizar_producto",
+                                                "producto": p,
+                                                "valor": df.at[i, p],
+                                                "semaforo": df.at[i, "SEMAFORO"],
+                                                "cliente": fila["CLIENTE"],
+                                                "dia": fila["DIA"].strftime("%Y-%m-%d")
+                                            }
+                                            api.llamar(datos)
+                                        except Exception as e:
+                                            # El semáforo compartido se vuelve a cargar: sin cambios a medias
+                                            st.error(f"❌ Error al actualizar en la API: {e}")
+                                            invalidar_clientes()
+                                        else:
+                                            cambios_guardados()
+                                        relanzar()
+                                else:
+                                    if cols[4 + j].button(label, key=f"{i}_{p}"):
+                                        advertir = True
+
+                            sem = fila["SEMAFORO"]
+                            if sem in colores_semaforo:
+                                bg, fg = colores_semaforo[sem]
+                                cols[-1].markdown(
+                                    f"<div style='background-color:{bg}; color:{fg}; padding:5px; text-align:center; border-radius:4px;'>"
+                                    f"<b>{sem}</b></div>",
+                                    unsafe_allow_html=True
+                                )
+
+                        if advertir and cliente not in clientes_advertidos:
+                            st.warning(f"⚠️ Solo puedes editar los datos del día actual para **{cliente}**.")
+                            clientes_advertidos.add(cliente)
+
+                        st.markdown("</div></div>", unsafe_allow_html=True)
+    else:
+        st.info("📭 No hay datos de clientes disponibles.")
+
+
 seccion_direccion = None  
+panel_tiempos = None
 
 if es_direccion:
     st.markdown("### 🔧 Secciones de Dirección")
     opciones = ["SEMAFORO", "CLOSERS", "SUPER CLOSERS", "GESTIÓN DE USUARIOS", "FUERA DE FLUJO"]
     seccion_direccion = st.radio("", opciones, horizontal=True)
-    
-    print(f"🔍 [DEBUG] Entrando en direccion")
+
+    if st.button("🔄 Recargar festivos", help="Volver a descargar el calendario de festivos desde la API"):
+        descargar_festivos.clear()
+        semaforo_coordinacion.clear()
+        indice_coordinacion.clear()
+        expirados_coordinacion.clear()
+        rojos_coordinacion.clear()
+        fechas_vacias_coordinacion.clear()
+        relanzar()
+
+    medicion.etiquetar(seccion=seccion_direccion)
+    # ⏱️ Se rellena al final del script, cuando ya se conocen todas las etapas
+    panel_tiempos = st.empty()
 
 
 
@@ -338,18 +754,15 @@ if seccion_direccion == "SEMAFORO":
     st.subheader("📊 Semáforo General — Consulta por Dirección")
 
     try:
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos = response.json()
-        df = pd.DataFrame(datos)
+        df = cargar_clientes()
 
         df = estandarizar_fechas(df)
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
         df = actualizar_semaforo(df)
 
         if "DIA" not in df.columns or df["DIA"].isna().all():
             st.info("📭 No hay clientes con fechas asignadas en el semáforo todavía.")
-            st.stop()
+            detener()
 
         # Mostrar solo una fila por cliente, la más reciente
         df = df.sort_values("DIA", ascending=False).drop_duplicates("CLIENTE")
@@ -380,7 +793,8 @@ if seccion_direccion == "SEMAFORO":
         }
 
         df_mostrar = df_filtrado[list(columnas_mostrar.keys())].rename(columns=columnas_mostrar)
-        st.dataframe(df_mostrar, use_container_width=True)
+        with medir("render:semaforo_general", "render", filas=len(df_mostrar)):
+            st.dataframe(df_mostrar, use_container_width=True)
 
         # --- Botón de resumen imprimible ---
         if "mostrar_resumen_direccion" not in st.session_state:
@@ -388,15 +802,15 @@ if seccion_direccion == "SEMAFORO":
 
         if st.button("🖨️ Resumen imprimible de clientes"):
             st.session_state.mostrar_resumen_direccion = not st.session_state.mostrar_resumen_direccion
-            st.rerun()
+            relanzar()
 
         if st.session_state.mostrar_resumen_direccion:
             df_resumen = df_filtrado.sort_values("DIA", ascending=False).drop_duplicates("CLIENTE")
 
             for _, row in df_resumen.iterrows():
-                productos_coord = [p for p in productos if row.get(p) == "✔"]
-                productos_closer = [p for p in productos if row.get(f"CLOSER_{p}") == "✔"]
-                productos_super = [p for p in productos if row.get(f"SUPER_{p}") == "✔"]
+                productos_coord = productos_marcados(row, productos)
+                productos_closer = productos_marcados(row, productos, "CLOSER_")
+                productos_super = productos_marcados(row, productos, "SUPERCLOSER_")
 
                 st.markdown("---")
                 st.markdown(f"**👤 Cliente: {row['CLIENTE']}**")
@@ -412,6 +826,24 @@ if seccion_direccion == "SEMAFORO":
                 st.info("🖨️ Usa Ctrl+P para imprimir o guardar como PDF desde tu navegador.")
                 st.markdown("""<script>window.print()</script>""", unsafe_allow_html=True)
 
+        # --- Posibles duplicados en todo el histórico ---
+        with st.expander("🧬 Posibles clientes duplicados", expanded=False):
+            if st.button("🔎 Buscar duplicados"):
+                # Mismo índice (y detector) que la vista de Coordinación: no se reconstruye por clic
+                with medir("indice_coordinacion", "datos", cache="acierto"):
+                    indice = indice_coordinacion(*clave_coordinacion())
+                with medir("duplicados:grupos", "datos", filas=indice.filas):
+                    grupos = indice.grupos_duplicados()
+                if not grupos:
+                    st.success("✅ No se han encontrado clientes duplicados.")
+                else:
+                    st.write(f"🧬 {len(grupos)} grupos de nombres que parecen el mismo cliente")
+                    st.dataframe(
+                        pd.DataFrame({"NOMBRES": [" · ".join(g) for g in grupos], "TOTAL": [len(g) for g in grupos]}),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
     except Exception as e:
         st.error(f"📭 No se pudo cargar el semáforo desde la API: {e}")
 
@@ -422,10 +854,7 @@ elif seccion_direccion == "CLOSERS":
 
     try:
         # 1. Obtener clientes desde la API
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos = response.json()
-        df = pd.DataFrame(datos)
+        df = cargar_clientes()
 
         df = estandarizar_fechas(df)
         df = actualizar_semaforo(df)
@@ -436,56 +865,57 @@ elif seccion_direccion == "CLOSERS":
 
         if "DIA" not in df.columns or df["DIA"].isna().all():
             st.info("📭 No hay clientes con fechas asignadas en el semáforo todavía.")
-            st.stop()
+            detener()
 
 
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
         df = df.sort_values("DIA", ascending=False).drop_duplicates("CLIENTE")
 
         df_closer = df[
             (df["SEMAFORO"] == "ROJO") &
             (df["DIAS_HABILES"] >= 3) &
-            (df["ASIGNADO_CLOSER"].astype(str).str.strip() == "") &
-            (df["ESTADO_CIERRE"].fillna("").str.upper() != "CERRADO")
+            igual_a(df["ASIGNADO_CLOSER"], "") &
+            ~igual_a(df["ESTADO_CIERRE"], "CERRADO")
         ].sort_values("FECHA_ENTRADA")
 
         if df_closer.empty:
             st.info("✅ No hay clientes disponibles para asignar a Closers hoy.")
         else:
-            for i, row in df_closer.iterrows():
-                with st.expander(f"📁 Cliente: {row['CLIENTE']}"):
-                    st.write(f"📞 **CAL:** {row['CAL']}")
-                    st.write(f"👤 **Comercial:** {row['COMERCIAL']}")
-                    st.write(f"🚦 **Semáforo:** {row['SEMAFORO']}")
-                    st.write(f"📅 **Fecha de entrada:** {row['FECHA_ENTRADA']} — Días hábiles: {row['DIAS_HABILES']}")
-
-                    st.markdown("### 🟢 Productos ofrecidos por Coordinación")
-                    fila_coord = st.columns(len(productos))
-                    for j, p in enumerate(productos):
-                        valor = row.get(p, "")
-                        fila_coord[j].markdown(f"**{p}**")
-                        fila_coord[j].markdown(f"<div style='text-align:center'>{valor}</div>", unsafe_allow_html=True)
+            with medir("render:clientes_closer", "render", filas=len(df_closer)):
+                for i, row in df_closer.iterrows():
+                    with st.expander(f"📁 Cliente: {row['CLIENTE']}"):
+                        st.write(f"📞 **CAL:** {row['CAL']}")
+                        st.write(f"👤 **Comercial:** {row['COMERCIAL']}")
+                        st.write(f"🚦 **Semáforo:** {row['SEMAFORO']}")
+                        st.write(f"📅 **Fecha de entrada:** {row['FECHA_ENTRADA']} — Días hábiles: {row['DIAS_HABILES']}")
+
+                        st.markdown("### 🟢 Productos ofrecidos por Coordinación")
+                        fila_coord = st.columns(len(productos))
+                        for j, p in enumerate(productos):
+                            valor = row.get(p, "")
+                            fila_coord[j].markdown(f"**{p}**")
+                            fila_coord[j].markdown(f"<div style='text-align:center'>{valor}</div>", unsafe_allow_html=True)
+
+                        nuevo_closer = st.text_input(f"👤 Asignar Closer a {row['CLIENTE']}", key=f"closer_input_{i}")
+                        if st.button("💾 Asignar Closer", key=f"asignar_closer_btn_{i}"):
+                            try:
+                                # 2. Enviar actualización a la API
+                                payload = {
+                                    "accion": "asignar_closer",
+                                    "cliente": row["CLIENTE"],
+                                    "closer": nuevo_closer.strip().upper(),
+                                    "fecha": datetime.now().date().isoformat()
+                                }
+                                respuesta = api.llamar(payload, como_json=False)
+                                invalidar_clientes()
 
-                    nuevo_closer = st.text_input(f"👤 Asignar Closer a {row['CLIENTE']}", key=f"closer_input_{i}")
-                    if st.button("💾 Asignar Closer", key=f"asignar_closer_btn_{i}"):
-                        try:
-                            # 2. Enviar actualización a la API
-                            payload = {
-                                "accion": "asignar_closer",
-                                "cliente": row["CLIENTE"],
-                                "closer": nuevo_closer.strip().upper(),
-                                "fecha": datetime.now().date().isoformat()
-                            }
-                            resp = requests.post(API_URL, data=payload)
-                            resp.raise_for_status()
-
-                            if resp.json().get("status") == "ok":
-                                st.success(f"✅ Cliente {row['CLIENTE']} asignado correctamente a {nuevo_closer}")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ Error al asignar desde API: {resp.text}")
-                        except Exception as e:
-                            st.error(f"❌ Error al conectar con la API: {e}")
+                                if isinstance(respuesta, dict) and respuesta.get("status") == "ok":
+                                    st.success(f"✅ Cliente {row['CLIENTE']} asignado correctamente a {nuevo_closer}")
+                                    relanzar()
+                                else:
+                                    st.error(f"❌ Error al asignar desde API: {respuesta}")
+                            except Exception as e:
+                                st.error(f"❌ Error al conectar con la API: {e}")
 
     except Exception as e:
         st.error(f"❌ No se pudo cargar la base de datos desde la API: {e}")
@@ -497,13 +927,10 @@ elif seccion_direccion == "SUPER CLOSERS":
 
     try:
         # Leer clientes desde la API
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos_clientes = response.json()
-        df = pd.DataFrame(datos_clientes)
+        df = cargar_clientes()
 
         df = estandarizar_fechas(df)
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
         df = actualizar_semaforo(df)
 
         for p in productos:
@@ -511,9 +938,7 @@ elif seccion_direccion == "SUPER CLOSERS":
                 df[p] = ""
 
         # Leer usuarios desde API
-        response_usuarios = requests.post(API_URL, data={"accion": "usuarios"})
-        response_usuarios.raise_for_status()
-        datos_usuarios = response_usuarios.json()
+        datos_usuarios = api.consultar("usuarios")
         df_usuarios = pd.DataFrame(datos_usuarios)
 
         superclosers_disponibles = df_usuarios[df_usuarios["rol"].str.upper() == "SUPER"]["usuario"].dropna().unique().tolist()
@@ -521,48 +946,49 @@ elif seccion_direccion == "SUPER CLOSERS":
         df_super = df[
             (df["SEMAFORO"] == "ROJO") &
             (df["DIAS_HABILES"] >= 5) &
-            (df["ASIGNADO_CLOSER"].fillna("").astype(str).str.strip() != "") &
-            (df["ASIGNADO_SUPERCLOSER"].fillna("").astype(str).str.strip() == "") &
-            (df["ESTADO_CIERRE"].fillna("").str.upper() != "CERRADO")
+            ~igual_a(df["ASIGNADO_CLOSER"], "") &
+            igual_a(df["ASIGNADO_SUPERCLOSER"], "") &
+            ~igual_a(df["ESTADO_CIERRE"], "CERRADO")
         ].sort_values("FECHA_ENTRADA")
 
         if df_super.empty:
             st.info("✅ No hay clientes disponibles para asignar a Superclosers hoy.")
         else:
-            for i, row in df_super.iterrows():
-                with st.expander(f"👤 Cliente: {row['CLIENTE']}"):
-                    st.write(f"📞 CAL: {row['CAL']}")
-                    st.write(f"🧑 Comercial: {row['COMERCIAL']}")
-                    st.write(f"📅 Fecha entrada: {row['FECHA_ENTRADA']} — Días hábiles: {row['DIAS_HABILES']}")
-                    st.write(f"🔗 Asignado a Closer: {row.get('ASIGNADO_CLOSER', '')}")
-
-                    st.markdown("### 🟢 Productos ofrecidos por Coordinación")
-                    fila_coord = st.columns(len(productos))
-                    for j, p in enumerate(productos):
-                        valor = row.get(p, "")
-                        fila_coord[j].markdown(f"**{p}**")
-                        fila_coord[j].markdown(f"<div style='text-align:center'>{valor}</div>", unsafe_allow_html=True)
-
-                    supercloser = st.selectbox(
-                        "👤 Seleccionar Supercloser",
-                        options=superclosers_disponibles,
-                        key=f"select_super_{i}"
-                    )
+            with medir("render:clientes_super", "render", filas=len(df_super)):
+                for i, row in df_super.iterrows():
+                    with st.expander(f"👤 Cliente: {row['CLIENTE']}"):
+                        st.write(f"📞 CAL: {row['CAL']}")
+                        st.write(f"🧑 Comercial: {row['COMERCIAL']}")
+                        st.write(f"📅 Fecha entrada: {row['FECHA_ENTRADA']} — Días hábiles: {row['DIAS_HABILES']}")
+                        st.write(f"🔗 Asignado a Closer: {row.get('ASIGNADO_CLOSER', '')}")
+
+                        st.markdown("### 🟢 Productos ofrecidos por Coordinación")
+                        fila_coord = st.columns(len(productos))
+                        for j, p in enumerate(productos):
+                            valor = row.get(p, "")
+                            fila_coord[j].markdown(f"**{p}**")
+                            fila_coord[j].markdown(f"<div style='text-align:center'>{valor}</div>", unsafe_allow_html=True)
+
+                        supercloser = st.selectbox(
+                            "👤 Seleccionar Supercloser",
+                            options=superclosers_disponibles,
+                            key=f"select_super_{i}"
+                        )
 
-                    if st.button("💾 Asignar Supercloser", key=f"btn_asignar_super_{i}"):
-                        try:
-                            payload = {
-                                "accion": "asignar_supercloser",
-                                "cliente": row["CLIENTE"],
-                                "nombre": supercloser,
-                                "fecha": str(datetime.now().date())
-                            }
-                            r = requests.post(API_URL, json=payload)
-                            r.raise_for_status()
-                            st.success(f"✅ Cliente {row['CLIENTE']} asignado a {supercloser}")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"❌ Error al guardar a través de la API: {e}")
+                        if st.button("💾 Asignar Supercloser", key=f"btn_asignar_super_{i}"):
+                            try:
+                                payload = {
+                                    "accion": "asignar_supercloser",
+                                    "cliente": row["CLIENTE"],
+                                    "nombre": supercloser,
+                                    "fecha": str(datetime.now().date())
+                                }
+                                api.llamar(payload)
+                                invalidar_clientes()
+                                st.success(f"✅ Cliente {row['CLIENTE']} asignado a {supercloser}")
+                                relanzar()
+                            except Exception as e:
+                                st.error(f"❌ Error al guardar a través de la API: {e}")
 
     except Exception as e:
         st.error(f"❌ No se pudo cargar la información desde la API: {e}")
@@ -572,19 +998,18 @@ elif seccion_direccion == "FUERA DE FLUJO":
     st.subheader("📦 Clientes fuera del flujo (día 6+)")
 
     try:
-        # Cargar clientes desde la API
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos_clientes = response.json()
-        df = pd.DataFrame(datos_clientes)
+        # Cargar desde la API solo los clientes que entraron este mes
+        inicio_mes = datetime.now().date().replace(day=1)
+        fin_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        df = cargar_clientes(desde=inicio_mes.isoformat(), hasta=fin_mes.isoformat())
 
         df = estandarizar_fechas(df)
         df = actualizar_semaforo(df)
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
 
         if "DIA" not in df.columns or df["DIA"].isna().all():
             st.info("📭 No hay clientes con fechas asignadas en el semáforo todavía.")
-            st.stop()
+            detener()
 
         df = df.sort_values("DIA", ascending=False).drop_duplicates("CLIENTE")
 
@@ -598,7 +1023,7 @@ elif seccion_direccion == "FUERA DE FLUJO":
 
         df_fuera = df[
             (df["DIAS_HABILES"] >= 5) &
-            (df["ESTADO_CIERRE"].fillna("").str.upper() != "CERRADO")
+            ~igual_a(df["ESTADO_CIERRE"], "CERRADO")
         ].sort_values("FECHA_ENTRADA")
 
         if df_fuera.empty:
@@ -610,13 +1035,11 @@ elif seccion_direccion == "FUERA DE FLUJO":
                 "ASIGNADO_CLOSER", "ASIGNADO_SUPERCLOSER",
                 "ESTADO_CIERRE", "SEMAFORO", "DIAS_HABILES"
             ]
-            st.dataframe(df_fuera[columnas_mostrar], use_container_width=True)
+            with medir("render:fuera_de_flujo", "render", filas=len(df_fuera)):
+                st.dataframe(df_fuera[columnas_mostrar], use_container_width=True)
 
-            # Exportar a Excel
-            if st.button("⬇️ Exportar a Excel"):
-                nombre_archivo = f"Clientes_Fuera_Flujo_{datetime.now().date()}.xlsx"
-                df_fuera[columnas_mostrar].to_excel(nombre_archivo, index=False)
-                st.success(f"📅 Archivo exportado: {nombre_archivo}")
+            # Exportar (xlsx / csv / parquet) como descarga para el usuario
+            ofrecer_descarga(df_fuera[columnas_mostrar], f"Clientes_Fuera_Flujo_{datetime.now().date()}", "fuera_flujo")
 
             # Mostrar versión imprimible en HTML
             from jinja2 import Template
@@ -655,9 +1078,7 @@ elif seccion_direccion == "GESTIÓN DE USUARIOS":
 
     try:
         # Obtener usuarios desde la API
-        response = requests.post(API_URL, data={"accion": "usuarios"})
-        response.raise_for_status()
-        datos_usuarios = response.json()
+        datos_usuarios = api.consultar("usuarios")
         df_usuarios = pd.DataFrame(datos_usuarios)
 
         st.markdown("### 📝 Editar usuarios existentes")
@@ -670,13 +1091,12 @@ elif seccion_direccion == "GESTIÓN DE USUARIOS":
 
         if st.button("💾 Guardar todos los cambios"):
             try:
-                response = requests.post(API_URL, json={
+                api.llamar({
                     "accion": "guardar_usuarios",
                     "usuarios": df_usuarios_editado.to_dict(orient="records")
                 })
-                response.raise_for_status()
                 st.success("✅ Cambios guardados correctamente.")
-                st.rerun()
+                relanzar()
             except Exception as e:
                 st.error(f"❌ Error al guardar usuarios: {e}")
 
@@ -690,15 +1110,14 @@ elif seccion_direccion == "GESTIÓN DE USUARIOS":
             if st.form_submit_button("➕ Añadir"):
                 if nuevo_usuario and nueva_contra:
                     try:
-                        response = requests.post(API_URL, json={
+                        api.llamar({
                             "accion": "nuevo_usuario",
                             "usuario": nuevo_usuario.strip(),
                             "contraseña": nueva_contra.strip(),
                             "rol": nuevo_rol.strip().upper()
                         })
-                        response.raise_for_status()
                         st.success(f"✅ Usuario {nuevo_usuario} añadido correctamente.")
-                        st.rerun()
+                        relanzar()
                     except Exception as e:
                         st.error(f"❌ Error al insertar usuario: {e}")
                 else:
@@ -708,419 +1127,33 @@ elif seccion_direccion == "GESTIÓN DE USUARIOS":
         usuario_a_borrar = st.selectbox("Selecciona un usuario para borrar", df_usuarios["usuario"].tolist())
         if st.button("🗑️ Eliminar usuario seleccionado"):
             try:
-                response = requests.post(API_URL, json={
+                api.llamar({
                     "accion": "borrar_usuario",
                     "usuario": usuario_a_borrar
                 })
-                response.raise_for_status()
                 st.success(f"✅ Usuario {usuario_a_borrar} eliminado correctamente.")
-                st.rerun()
+                relanzar()
             except Exception as e:
                 st.error(f"❌ Error al eliminar usuario: {e}")
 
     except Exception as e:
         st.error(f"❌ No se pudo cargar la tabla de usuarios: {e}")
 
-    try:
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos = response.json()
-        df = pd.DataFrame(datos)
-
-        # Solo continuamos si hay columnas mínimas
-        if df.empty:
-            df = pd.DataFrame(columns=["CAL", "COMERCIAL", "CLIENTE", "FECHA_ENTRADA", "DIA"])  # estructura mínima
-
-        df = estandarizar_fechas(df)
+    mostrar_semaforo_coordinacion()
 
-        if "DIAS_HABILES" not in df.columns and "FECHA_ENTRADA" in df.columns:
-            df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
-        
-        df = actualizar_semaforo(df)
-
-    except Exception as e:
-        st.error(f"❌ Error al cargar los datos de clientes: {e}")
-        # Crear un DataFrame vacío con columnas mínimas para que la app siga funcionando
-        df = pd.DataFrame(columns=["CAL", "COMERCIAL", "CLIENTE", "FECHA_ENTRADA", "DIA", "SEMAFORO"])
-
-    # --- Inicializar filtros si no existen ---
-    if "filtros" not in st.session_state:
-        st.session_state.filtros = {
-            "CAL": st.session_state.usuario,
-            "COMERCIAL": "",
-            "CLIENTE": "",
-            "SEMAFORO": ""
-        }
-
-
-    # --- Expander de filtros ---
-    with st.expander("🔍 Filtros de búsqueda", expanded=False):
-        with st.form("form_filtros_aplicar"):
-            c1, c2, c3, c4 = st.columns(4)
-            CAL = c1.text_input("CAL", value=st.session_state.filtros.get("CAL", st.session_state.usuario))
-            comercial = c2.text_input("COMERCIAL", value=st.session_state.filtros.get("COMERCIAL", ""))
-            cliente = c3.text_input("CLIENTE", value=st.session_state.filtros.get("CLIENTE", ""))
-            semaforo = c4.selectbox("SEMAFORO", options=[""] + list(colores_semaforo.keys()), index=0)
-
-            if st.form_submit_button("✅ Aplicar filtros"):
-                st.session_state.filtros = {
-                    "CAL": CAL,
-                    "COMERCIAL": comercial,
-                    "CLIENTE": cliente,
-                    "SEMAFORO": semaforo
-                }
-                st.rerun()
-
-        with st.form("form_filtros_borrar"):
-            if st.form_submit_button("🩹 Mostrar todos"):
-                st.session_state.filtros = {
-                    "CAL": "",
-                    "COMERCIAL": "",
-                    "CLIENTE": "",
-                    "SEMAFORO": ""
-                }
-                st.rerun()
-
-    # --- Aplicar filtros al dataframe ---
-    f = st.session_state.filtros
-    df_filtrado = df.copy()
-
-    if f["CAL"]:
-        df_filtrado = df_filtrado[df_filtrado["CAL"].str.contains(f["CAL"], case=False, na=False)]
-    if f["COMERCIAL"]:
-        df_filtrado = df_filtrado[df_filtrado["COMERCIAL"].str.contains(f["COMERCIAL"], case=False, na=False)]
-    if f["CLIENTE"]:
-        df_filtrado = df_filtrado[df_filtrado["CLIENTE"].str.contains(f["CLIENTE"], case=False, na=False)]
-    if f["SEMAFORO"]:
-        df_filtrado = df_filtrado[df_filtrado["SEMAFORO"] == f["SEMAFORO"]]
-
-    # --- Insertar cliente ---
-    with st.form("insertar_cliente", clear_on_submit=True):
-        col1, col2 = st.columns(2)
-        comercial = col1.text_input("Nombre del COMERCIAL", key="comercial_input")
-        cliente = col2.text_input("Nombre del CLIENTE", key="cliente_input")
-
-        if st.form_submit_button("➕ Añadir Cliente"):
-            cliente_normalizado = cliente.strip().upper()
-            if cliente_normalizado in df["CLIENTE"].str.strip().str.upper().tolist():
-                st.warning("⚠️ Ese cliente ya existe en el semáforo.")
-            else:
-                nuevo = insertar_cliente(st.session_state.usuario, comercial, cliente)
-                df = pd.concat([df, nuevo], ignore_index=True)
-                df = actualizar_semaforo(df)
-
-                # ✅ Enviar cada fila por POST a la API PHP
-                errores_api = []
-                for _, fila in nuevo.iterrows():
-                    datos = {
-                        "accion": "insertar_cliente",
-                        "CAL": fila["CAL"],
-                        "COMERCIAL": fila["COMERCIAL"],
-                        "CLIENTE": fila["CLIENTE"],
-                        "DIA": fila["DIA"].strftime("%Y-%m-%d"),
-                        "FECHA_ENTRADA": fila["FECHA_ENTRADA"].strftime("%Y-%m-%d")
-                    }
-                    try:
-                        r = requests.post(API_URL, json=datos)
-                        r.raise_for_status()
-                    except Exception as e:
-                        errores_api.append(str(e))
-
-                if errores_api:
-                    st.error(f"❌ Fallo al guardar en la API: {errores_api}")
-                else:
-                    st.success("✅ Cliente añadido correctamente.")
-
-                st.session_state.filtros = {
-                    "CAL": "",
-                    "COMERCIAL": "",
-                    "CLIENTE": "",
-                    "SEMAFORO": ""
-                }
-                st.rerun()
-
-    # --- Visualización del semáforo ---
-    if "CLIENTE" in df_filtrado.columns:
-        hoy = datetime.now().date()
-        clientes_advertidos = set()
-        df_visible = df_filtrado.copy()
-
-        df_visible = df_visible[
-            (df_visible["DIAS_HABILES"] < 3) &
-            (df_visible["ASIGNADO_CLOSER"].fillna("").astype(str).str.strip() == "") &
-            (df_visible["ASIGNADO_SUPERCLOSER"].fillna("").astype(str).str.strip() == "")
-        ]
-
-        if df_visible.empty:
-            st.info("📭 No hay clientes asignados a este usuario en este momento.")
-        else:
-            cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
-            cols[0].markdown("**CAL**")
-            cols[1].markdown("**COMERCIAL**")
-            cols[2].markdown("**CLIENTE**")
-            cols[3].markdown("**DÍA**")
-            for j, p in enumerate(productos):
-                cols[4 + j].markdown(f"**{p}**")
-            cols[-1].markdown("**SEMAFORO**")
-
-            for cliente in df_visible["CLIENTE"].unique():
-                bloque = df_visible[df_visible["CLIENTE"] == cliente]
-                st.markdown("<div class='bloque-cliente-wrap'><div class='bloque-cliente-inner'>", unsafe_allow_html=True)
-                advertir = False
-
-                for i, fila in bloque.iterrows():
-                    cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
-                    cols[0].markdown(fila["CAL"])
-                    cols[1].markdown(fila["COMERCIAL"])
-                    cols[2].markdown(fila["CLIENTE"])
-                    cols[3].markdown(fila["DIA"].strftime("%d/%m"))
-
-                    for j, p in enumerate(productos):
-                        if fila["DIA"] == hoy:
-                            if cols[4 + j].button(fila[p], key=f"{i}_{p}"):
-                                df.at[i, p] = "✔" if fila[p] == "❌" else "❌"
-                                df = actualizar_semaforo(df)
-                                try:
-                                    datos = {
-                                        "accion": "actualizar_producto",
-                                        "producto": p,
-                                        "valor": df.at[i, p],
-                                        "semaforo": df.at[i, "SEMAFORO"],
-                                        "cliente": fila["CLIENTE"],
-                                        "dia": fila["DIA"].strftime("%Y-%m-%d")
-                                    }
-                                    r = requests.post(API_URL, json=datos)
-                                    r.raise_for_status()
-                                except Exception as e:
-                                    st.error(f"❌ Error al actualizar en la API: {e}")
-                                st.rerun()
-                        else:
-                            if cols[4 + j].button(fila[p], key=f"{i}_{p}"):
-                                advertir = True
-
-                    sem = fila["SEMAFORO"]
-                    if sem in colores_semaforo:
-                        bg, fg = colores_semaforo[sem]
-                        cols[-1].markdown(
-                            f"<div style='background-color:{bg}; color:{fg}; padding:5px; text-align:center; border-radius:4px;'>"
-                            f"<b>{sem}</b></div>",
-                            unsafe_allow_html=True
-                        )
-
-                if advertir and cliente not in clientes_advertidos:
-                    st.warning(f"⚠️ Solo puedes editar los datos del día actual para **{cliente}**.")
-                    clientes_advertidos.add(cliente)
-
-                st.markdown("</div></div>", unsafe_allow_html=True)
-
-    else:
-        st.info("📭 No hay datos de clientes disponibles.")
 
 if es_coordinador:
     st.subheader(f"👩‍💼 Coordinación — {st.session_state.usuario}")
-
-    try:
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        datos = response.json()
-        df = pd.DataFrame(datos)
-
-        # 🔒 Normalizar nombres de columnas y asegurar columnas mínimas
-        df.columns = [col.upper().strip() for col in df.columns]
-        for col in columnas_base:
-            if col not in df.columns:
-                df[col] = ""
-
-        df = estandarizar_fechas(df)
-
-        if "FECHA_ENTRADA" in df.columns:
-            df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
-
-        df = actualizar_semaforo(df)
-
-    except Exception as e:
-        st.error(f"❌ Error al cargar los datos de clientes: {e}")
-        df = pd.DataFrame(columns=["CAL", "COMERCIAL", "CLIENTE", "FECHA_ENTRADA", "DIA", "SEMAFORO"])
-
-    if "filtros" not in st.session_state:
-        st.session_state.filtros = {
-            "CAL": st.session_state.usuario,
-            "COMERCIAL": "",
-            "CLIENTE": "",
-            "SEMAFORO": ""
-        }
-
-    with st.expander("🔍 Filtros de búsqueda", expanded=False):
-        with st.form("form_filtros_aplicar"):
-            c1, c2, c3, c4 = st.columns(4)
-            CAL = c1.text_input("CAL", value=st.session_state.filtros.get("CAL", st.session_state.usuario))
-            comercial = c2.text_input("COMERCIAL", value=st.session_state.filtros.get("COMERCIAL", ""))
-            cliente = c3.text_input("CLIENTE", value=st.session_state.filtros.get("CLIENTE", ""))
-            semaforo = c4.selectbox("SEMAFORO", options=[""] + list(colores_semaforo.keys()), index=0)
-
-            if st.form_submit_button("✅ Aplicar filtros"):
-                st.session_state.filtros = {
-                    "CAL": CAL,
-                    "COMERCIAL": comercial,
-                    "CLIENTE": cliente,
-                    "SEMAFORO": semaforo
-                }
-                st.rerun()
-
-        with st.form("form_filtros_borrar"):
-            if st.form_submit_button("🩹 Mostrar todos"):
-                st.session_state.filtros = {
-                    "CAL": "",
-                    "COMERCIAL": "",
-                    "CLIENTE": "",
-                    "SEMAFORO": ""
-                }
-                st.rerun()
-
-    f = st.session_state.filtros
-    df_filtrado = df.copy()
-
-    if f["CAL"]:
-        df_filtrado = df_filtrado[df_filtrado["CAL"].str.contains(f["CAL"], case=False, na=False)]
-    if f["COMERCIAL"]:
-        df_filtrado = df_filtrado[df_filtrado["COMERCIAL"].str.contains(f["COMERCIAL"], case=False, na=False)]
-    if f["CLIENTE"]:
-        df_filtrado = df_filtrado[df_filtrado["CLIENTE"].str.contains(f["CLIENTE"], case=False, na=False)]
-    if f["SEMAFORO"]:
-        df_filtrado = df_filtrado[df_filtrado["SEMAFORO"] == f["SEMAFORO"]]
-
-    with st.form("insertar_cliente", clear_on_submit=True):
-        col1, col2 = st.columns(2)
-        comercial = col1.text_input("Nombre del COMERCIAL", key="comercial_input")
-        cliente = col2.text_input("Nombre del CLIENTE", key="cliente_input")
-
-        if st.form_submit_button("➕ Añadir Cliente"):
-            cliente_normalizado = cliente.strip().upper()
-            if cliente_normalizado in df["CLIENTE"].str.strip().str.upper().tolist():
-                st.warning("⚠️ Ese cliente ya existe en el semáforo.")
-            else:
-                nuevo = insertar_cliente(st.session_state.usuario, comercial, cliente)
-                df = pd.concat([df, nuevo], ignore_index=True)
-                df = actualizar_semaforo(df)
-
-                errores_api = []
-                for _, fila in nuevo.iterrows():
-                    datos = {
-                        "accion": "insertar_cliente",
-                        "CAL": fila["CAL"],
-                        "COMERCIAL": fila["COMERCIAL"],
-                        "CLIENTE": fila["CLIENTE"],
-                        "DIA": fila["DIA"].strftime("%Y-%m-%d"),
-                        "FECHA_ENTRADA": fila["FECHA_ENTRADA"].strftime("%Y-%m-%d")
-                    }
-                    try:
-                        r = requests.post(API_URL, json=datos)
-                        r.raise_for_status()
-                    except Exception as e:
-                        errores_api.append(str(e))
-
-                if errores_api:
-                    st.error(f"❌ Fallo al guardar en la API: {errores_api}")
-                else:
-                    st.success("✅ Cliente añadido correctamente.")
-
-                st.session_state.filtros = {
-                    "CAL": "",
-                    "COMERCIAL": "",
-                    "CLIENTE": "",
-                    "SEMAFORO": ""
-                }
-                st.rerun()
-
-    if "CLIENTE" in df_filtrado.columns and not df_filtrado.empty:
-        hoy = datetime.now().date()
-        clientes_advertidos = set()
-        df_visible = df_filtrado.copy()
-
-        df_visible = df_visible[
-            (df_visible["DIAS_HABILES"] < 3) &
-            (df_visible["ASIGNADO_CLOSER"].fillna("").astype(str).str.strip() == "") &
-            (df_visible["ASIGNADO_SUPERCLOSER"].fillna("").astype(str).str.strip() == "")
-        ]
-
-        if df_visible.empty:
-            st.info("📭 No hay clientes asignados a este usuario en este momento.")
-        else:
-            cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
-            cols[0].markdown("**CAL**")
-            cols[1].markdown("**COMERCIAL**")
-            cols[2].markdown("**CLIENTE**")
-            cols[3].markdown("**DÍA**")
-            for j, p in enumerate(productos):
-                cols[4 + j].markdown(f"**{p}**")
-            cols[-1].markdown("**SEMAFORO**")
-
-            for cliente in df_visible["CLIENTE"].unique():
-                bloque = df_visible[df_visible["CLIENTE"] == cliente]
-                st.markdown("<div class='bloque-cliente-wrap'><div class='bloque-cliente-inner'>", unsafe_allow_html=True)
-                advertir = False
-
-                for i, fila in bloque.iterrows():
-                    cols = st.columns([1.2, 1.2, 1.5, 1.1] + [0.7]*len(productos) + [1.5])
-                    cols[0].markdown(fila["CAL"])
-                    cols[1].markdown(fila["COMERCIAL"])
-                    cols[2].markdown(fila["CLIENTE"])
-                    cols[3].markdown(fila["DIA"].strftime("%d/%m"))
-
-                    for j, p in enumerate(productos):
-                        label = str(fila.get(p, "❌"))
-                        if fila["DIA"] == hoy:
-                            if cols[4 + j].button(label, key=f"{i}_{p}"):
-                                df.at[i, p] = "✔" if fila[p] == "❌" else "❌"
-                                df = actualizar_semaforo(df)
-                                try:
-                                    datos = {
-                                        "accion": "actualizar_producto",
-                                        "producto": p,
-                                        "valor": df.at[i, p],
-                                        "semaforo": df.at[i, "SEMAFORO"],
-                                        "cliente": fila["CLIENTE"],
-                                        "dia": fila["DIA"].strftime("%Y-%m-%d")
-                                    }
-                                    r = requests.post(API_URL, json=datos)
-                                    r.raise_for_status()
-                                except Exception as e:
-                                    st.error(f"❌ Error al actualizar en la API: {e}")
-                                st.rerun()
-                        else:
-                            if cols[4 + j].button(fila[p], key=f"{i}_{p}"):
-                                advertir = True
-
-                    sem = fila["SEMAFORO"]
-                    if sem in colores_semaforo:
-                        bg, fg = colores_semaforo[sem]
-                        cols[-1].markdown(
-                            f"<div style='background-color:{bg}; color:{fg}; padding:5px; text-align:center; border-radius:4px;'>"
-                            f"<b>{sem}</b></div>",
-                            unsafe_allow_html=True
-                        )
-
-                if advertir and cliente not in clientes_advertidos:
-                    st.warning(f"⚠️ Solo puedes editar los datos del día actual para **{cliente}**.")
-                    clientes_advertidos.add(cliente)
-
-                st.markdown("</div></div>", unsafe_allow_html=True)
-    else:
-        st.info("📭 No hay datos de clientes disponibles.")
-
-
+    mostrar_semaforo_coordinacion()
 
 
 elif es_closer:
     st.subheader("📋 Seguimiento de Clientes Asignados (Closer)")
     try:
-        respuesta = requests.post(API_URL, data={"accion": "clientes"})
-        respuesta.raise_for_status()
-        datos = respuesta.json()
-        df = pd.DataFrame(datos)
+        df = cargar_clientes(rol="CLOSER", asignado=usuario_actual)
 
         df = estandarizar_fechas(df)
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
 
         productos_closer = [f"CLOSER_{p}" for p in productos]
         for p in productos_closer:
@@ -1132,20 +1165,16 @@ elif es_closer:
 
 
         df_closer = df[
-            (df["ASIGNADO_CLOSER"].astype(str).str.upper() == usuario_actual) &
+            igual_a(df["ASIGNADO_CLOSER"], usuario_actual) &
             (df["GESTIONADO_CLOSER"] != True)
         ].sort_values("FECHA_ENTRADA")
+        # Copiar ✔ de Coordinación si CLOSER_* vacío
+        df_closer = heredar_flags(df_closer, "CLOSER", ["COORDINACION"])
 
         if df_closer.empty:
             st.info("🔕 No tienes clientes asignados actualmente.")
         else:
             for i, row in df_closer.iterrows():
-                # Copiar ✔ de Coordinación si CLOSER_* vacío
-                for p in productos:
-                    col_closer = f"CLOSER_{p}"
-                    if row.get(p) == "✔" and row.get(col_closer, "") not in ["✔", "❌"]:
-                        row[col_closer] = "✔"
-
                 with st.expander(f"👤 Cliente: {row['CLIENTE']} — Semáforo: {row['SEMAFORO']}"):
                     st.write(f"📞 CAL: {row['CAL']}")
                     st.write(f"🧑 Comercial: {row['COMERCIAL']}")
@@ -1197,11 +1226,11 @@ elif es_closer:
                                 "gestionado": True,
                                 "productos": valores_closer_actualizados
                             }
-                            response = requests.post(API_URL, json=payload)
-                            response.raise_for_status()
+                            api.llamar(payload)
+                            invalidar_clientes()
 
                             st.success(f"✅ Seguimiento de {row['CLIENTE']} actualizado.")
-                            st.rerun()
+                            relanzar()
                         except Exception as e:
                             st.error(f"❌ Error al guardar mediante API: {e}")
 
@@ -1213,13 +1242,10 @@ elif es_super:
     st.subheader("📋 Seguimiento de Clientes Escalados (Supercloser)")
 
     try:
-        response = requests.post(API_URL, data={"accion": "clientes"})
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data)
+        df = cargar_clientes(rol="SUPER", asignado=usuario_actual)
 
         df = estandarizar_fechas(df)
-        df["DIAS_HABILES"] = df["FECHA_ENTRADA"].apply(dias_habiles)
+        df["DIAS_HABILES"] = dias_habiles(df["FECHA_ENTRADA"])
 
         productos_super = [f"SUPERCLOSER_{p}" for p in productos]
         for p in productos_super:
@@ -1231,21 +1257,17 @@ elif es_super:
 
 
         df_super = df[
-            (df["ASIGNADO_SUPERCLOSER"].astype(str).str.upper() == usuario_actual) &
+            igual_a(df["ASIGNADO_SUPERCLOSER"], usuario_actual) &
             (df["DIAS_HABILES"] >= 5) &
             (df["GESTIONADO_SUPER"] != True)
         ].sort_values("FECHA_ENTRADA")
+        # SUPERCLOSER_* vacío parte de los ✔ de Coordinación o del Closer
+        df_super = heredar_flags(df_super, "SUPERCLOSER", ["COORDINACION", "CLOSER"])
 
         if df_super.empty:
             st.info("🔕 No tienes clientes escalados actualmente.")
         else:
             for i, row in df_super.iterrows():
-                for p in productos:
-                    col_super = f"SUPERCLOSER_{p}"
-                    if row.get(col_super, "") not in ["✔", "❌"]:
-                        if row.get(p) == "✔" or row.get(f"CLOSER_{p}", "") == "✔":
-                            row[col_super] = "✔"
-
                 with st.expander(f"👤 Cliente: {row['CLIENTE']} — Semáforo: {row['SEMAFORO']}"):
                     st.write(f"📞 CAL: {row['CAL']}")
                     st.write(f"🧑 Comercial: {row['COMERCIAL']}")
@@ -1309,13 +1331,48 @@ elif es_super:
                                 }
                             }
 
-                            response = requests.post(API_URL, json=payload)
-                            response.raise_for_status()
+                            api.llamar(payload)
+                            invalidar_clientes()
                             st.success(f"✅ Seguimiento de {row['CLIENTE']} actualizado.")
-                            st.rerun()
+                            relanzar()
 
                         except Exception as e:
                             st.error(f"❌ Error al guardar vía API: {e}")
 
     except Exception as e:
         st.error(f"📭 No se pudo cargar la información de clientes desde la base de datos: {e}")
+
+
+# --- PANEL DE TIEMPOS (solo Dirección) ---
+def mostrar_panel_tiempos(contenedor, medicion):
+    filas, total = filas_cascada(medicion)
+    with contenedor.container():
+        with st.expander(f"⏱️ Tiempos de este rerun — {total:.0f} ms", expanded=False):
+            if not filas:
+                st.info("No se registró ninguna etapa en este rerun.")
+                return
+
+            totales = totales_por_categoria(medicion)
+            cols = st.columns(len(COLORES_CATEGORIA))
+            for col, categoria in zip(cols, COLORES_CATEGORIA):
+                col.metric(categoria.upper(), f"{totales.get(categoria, 0.0):.0f} ms")
+
+            barras = []
+            for fila in filas:
+                color = COLORES_CATEGORIA.get(fila["categoria"], "#999")
+                sangria = "&nbsp;" * 4 * fila["nivel"]
+                barras.append(
+                    "<div style='display:flex; align-items:center; font-size:12px; margin:1px 0;'>"
+                    f"<div style='width:30%; white-space:nowrap; overflow:hidden;'>{sangria}{fila['etapa']}</div>"
+                    "<div style='width:58%; position:relative; height:12px; background:#f0f0f0;'>"
+                    f"<div style='position:absolute; left:{fila['desde_pct']:.2f}%; width:max({fila['ancho_pct']:.2f}%, 1px); "
+                    f"height:100%; background:{color};'></div></div>"
+                    f"<div style='width:12%; text-align:right;'>{fila['duracion_ms']:.1f} ms</div>"
+                    "</div>"
+                )
+            st.markdown("".join(barras), unsafe_allow_html=True)
+
+
+finalizar_rerun()
+if panel_tiempos is not None:
+    mostrar_panel_tiempos(panel_tiempos, medicion)
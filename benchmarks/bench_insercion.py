@@ -0,0 +1,175 @@
+# --- BENCHMARK: inserción fila a fila vs. inserción por lotes ---
+# Levanta un servidor local que imita insertar_cliente / insertar_clientes con
+# latencia simulada y compara tiempos. La atomicidad del lote se comprueba contra
+# servidor_local.py (SQLite de verdad): un lote que falla en la tercera fila, con
+# las dos primeras ya insertadas, no debe dejar nada escrito. También se comprueba
+# que sin la acción por lotes se vuelve a insertar_cliente.
+#
+#   python benchmarks/bench_insercion.py --clientes 20 --latencia 40
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_semaforo import ClienteAPI, ErrorAPI  # noqa: E402
+from servidor_local import ServidorLocal  # noqa: E402
+
+CAMPOS = ("CAL", "COMERCIAL", "CLIENTE", "DIA", "FECHA_ENTRADA")
+
+
+class ServidorInsercion(ThreadingHTTPServer):
+    def __init__(self, latencia, con_lotes=True):
+        super().__init__(("127.0.0.1", 0), ManejadorInsercion)
+        self.latencia = latencia
+        # Sin lotes imita al backend PHP actual, que solo conoce insertar_cliente
+        self.con_lotes = con_lotes
+        self.filas = []
+        self.bloqueo = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/api_semaforo.php"
+
+
+class ManejadorInsercion(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            datos = json.loads(cuerpo or b"{}")
+        else:
+            datos = {k: v[0] for k, v in parse_qs(cuerpo.decode()).items()}
+
+        time.sleep(self.server.latencia)
+        accion = datos.get("accion")
+        if accion == "insertar_cliente":
+            filas = [datos]
+        elif accion == "insertar_clientes" and self.server.con_lotes:
+            filas = datos.get("filas", [])
+        else:
+            return self._responder(400, {"status": "error", "mensaje": f"accion desconocida: {accion}"})
+
+        # Solo mide tiempos: no valida ni es transaccional (eso se comprueba con servidor_local)
+        with self.server.bloqueo:
+            self.server.filas.extend({c: fila[c] for c in CAMPOS} for fila in filas)
+        self._responder(200, {"status": "ok", "insertados": len(filas)})
+
+    def _responder(self, codigo, datos):
+        salida = json.dumps(datos).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(salida)))
+        self.end_headers()
+        self.wfile.write(salida)
+
+    def log_message(self, *args):
+        pass
+
+
+def filas_cliente(nombre):
+    hoy = date.today()
+    return [
+        {
+            "CAL": "CAL1",
+            "COMERCIAL": "COMERCIAL1",
+            "CLIENTE": nombre,
+            "DIA": (hoy + timedelta(days=i)).isoformat(),
+            "FECHA_ENTRADA": hoy.isoformat(),
+        }
+        for i in range(3)
+    ]
+
+
+def insertar_fila_a_fila(api, filas):
+    for fila in filas:
+        api.llamar({"accion": "insertar_cliente", **fila})
+
+
+def comprobar_atomicidad():
+    # El servidor local inserta fila a fila dentro de una transacción: la tercera
+    # fila falla cuando las dos primeras ya se han ejecutado
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_db = os.path.join(carpeta, "atomicidad.sqlite3")
+        servidor = ServidorLocal(("127.0.0.1", 0), ruta_db)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            api = ClienteAPI(servidor.url)
+            filas = filas_cliente("ATOMICO")
+            filas[2]["DIA"] = ""
+            try:
+                api.insertar_clientes(filas)
+            except ErrorAPI as e:
+                assert e.rechazada, f"el rechazo del lote debería llevar status: {e}"
+            else:
+                raise AssertionError("el lote con una fila incompleta debería rechazarse")
+
+            with sqlite3.connect(ruta_db) as conexion:
+                escritas = conexion.execute('SELECT COUNT(*) FROM clientes WHERE "CLIENTE" = ?', ("ATOMICO",)).fetchone()[0]
+            assert escritas == 0, f"el lote rechazado ha dejado {escritas} filas escritas"
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+
+def comprobar_sin_lotes(latencia):
+    servidor = ServidorInsercion(latencia, con_lotes=False)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        api = ClienteAPI(servidor.url)
+        api.insertar_clientes(filas_cliente("SIN_LOTES"))
+        assert api.lotes == {"insertar_clientes": False}
+        assert [f["CLIENTE"] for f in servidor.filas] == ["SIN_LOTES"] * 3
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inserción fila a fila vs. por lotes")
+    parser.add_argument("--clientes", type=int, default=20)
+    parser.add_argument("--latencia", type=float, default=40, help="milisegundos por petición")
+    args = parser.parse_args()
+
+    servidor = ServidorInsercion(args.latencia / 1000)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    api = ClienteAPI(servidor.url)
+
+    comprobar_atomicidad()
+    comprobar_sin_lotes(args.latencia / 1000)
+
+    inicio = time.perf_counter()
+    for n in range(args.clientes):
+        insertar_fila_a_fila(api, filas_cliente(f"BUCLE_{n}"))
+    t_bucle = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for n in range(args.clientes):
+        api.insertar_clientes(filas_cliente(f"LOTE_{n}"))
+    t_lote = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    api.insertar_clientes([f for n in range(args.clientes) for f in filas_cliente(f"IMPORT_{n}")])
+    t_import = time.perf_counter() - inicio
+
+    assert len(servidor.filas) == 3 * 3 * args.clientes
+    servidor.shutdown()
+
+    print(f"clientes={args.clientes} latencia={args.latencia:.0f} ms")
+    print(f"  fila a fila (3 peticiones/cliente): {t_bucle * 1000 / args.clientes:8.1f} ms/cliente")
+    print(f"  lote por cliente (1 petición):      {t_lote * 1000 / args.clientes:8.1f} ms/cliente")
+    print(f"  lote único para todos:              {t_import * 1000 / args.clientes:8.1f} ms/cliente")
+
+
+if __name__ == "__main__":
+    main()
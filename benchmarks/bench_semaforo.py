@@ -0,0 +1,157 @@
+# --- BENCHMARK DEL PIPELINE DEL SEMÁFORO ---
+# Mide cada etapa de datos sobre tablas sintéticas de distintos tamaños y guarda
+# los tiempos en JSON para poder comparar ejecuciones.
+#
+#   python benchmarks/bench_semaforo.py --filas 1000,10000,100000
+#   python benchmarks/bench_semaforo.py --comparar benchmarks/resultados/anterior.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendario import dias_habiles_serie  # noqa: E402
+from generador import festivos_nacionales, generar_clientes  # noqa: E402
+from semaforo import (  # noqa: E402
+    COLUMNAS_BASE,
+    FILTROS_VACIOS,
+    PRODUCTOS,
+    actualizar_semaforo,
+    aplicar_filtros,
+    clientes_en_semaforo,
+    detectar_expirados,
+    estandarizar_fechas,
+    filtrar_clientes,
+    preparar_semaforo,
+)
+
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+TAMANOS = [1_000, 10_000, 100_000, 1_000_000]
+UMBRAL_REGRESION = 1.2
+
+
+def etapas(hoy, festivos):
+    # nombre → (usa la tabla cruda de la API o la ya preparada, función)
+    return {
+        "estandarizar_fechas": ("cruda", lambda df: estandarizar_fechas(df.copy())),
+        "preparar_semaforo": ("cruda", lambda df: preparar_semaforo(df, COLUMNAS_BASE, PRODUCTOS, festivos, hoy)),
+        "dias_habiles": ("preparada", lambda df: dias_habiles_serie(df["FECHA_ENTRADA"], festivos, hoy)),
+        "actualizar_semaforo": ("preparada", lambda df: actualizar_semaforo(df, PRODUCTOS, hoy)),
+        "limpiar_clientes_expirados": ("preparada", lambda df: detectar_expirados(df, festivos, hoy)),
+        "filtro_closer": ("preparada", lambda df: filtrar_clientes(df, rol="CLOSER", asignado="CLOSER 03")),
+        "filtro_super": ("preparada", lambda df: filtrar_clientes(df, rol="SUPER", asignado="SUPER 01")),
+        "filtro_coordinacion": ("preparada", lambda df: aplicar_filtros(df, {**FILTROS_VACIOS, "CAL": "cal07"})),
+        "clientes_en_semaforo": ("preparada", clientes_en_semaforo),
+    }
+
+
+def medir(funcion, df, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(df)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def ejecutar(tamanos, repeticiones, limite_s, solo=None, hoy=None):
+    hoy = hoy or date.today()
+    festivos = festivos_nacionales(range(hoy.year - 2, hoy.year + 2))
+    lentas = set()
+    resultados = []
+
+    for filas in tamanos:
+        cruda = generar_clientes(filas, hoy, festivos)
+        # La misma tabla que usa la app: fechas, bits de ✔/❌, categóricas y DIAS_HABILES
+        preparada = preparar_semaforo(cruda, COLUMNAS_BASE, PRODUCTOS, festivos, hoy)
+
+        for nombre, (entrada, funcion) in etapas(hoy, festivos).items():
+            if solo and nombre not in solo:
+                continue
+            registro = {"etapa": nombre, "filas": len(cruda)}
+            if nombre in lentas:
+                # Si ya superó el límite con menos filas no merece la pena esperar
+                registro["omitido"] = True
+                resultados.append(registro)
+                print(f"{nombre:28s} {len(cruda):>9d} filas   omitido")
+                continue
+
+            df = cruda if entrada == "cruda" else preparada
+            tiempos = medir(funcion, df, repeticiones)
+            registro.update({
+                "mediana_ms": round(statistics.median(tiempos), 3),
+                "min_ms": round(min(tiempos), 3),
+                "repeticiones": repeticiones,
+            })
+            resultados.append(registro)
+            print(f"{nombre:28s} {len(cruda):>9d} filas {registro['mediana_ms']:>11.1f} ms")
+            if registro["mediana_ms"] > limite_s * 1000:
+                lentas.add(nombre)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "hoy": hoy.isoformat(),
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "maquina": platform.machine(),
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, anterior):
+    previos = {(r["etapa"], r["filas"]): r for r in anterior["resultados"] if "mediana_ms" in r}
+    regresiones = 0
+    print(f"\n{'etapa':28s} {'filas':>9s} {'antes':>10s} {'ahora':>10s} {'ratio':>7s}")
+    for r in actual["resultados"]:
+        previo = previos.get((r["etapa"], r["filas"]))
+        if not previo or "mediana_ms" not in r:
+            continue
+        ratio = r["mediana_ms"] / previo["mediana_ms"] if previo["mediana_ms"] else float("inf")
+        marca = "  ⚠️" if ratio > UMBRAL_REGRESION else ""
+        regresiones += ratio > UMBRAL_REGRESION
+        print(f"{r['etapa']:28s} {r['filas']:>9d} {previo['mediana_ms']:>10.1f} {r['mediana_ms']:>10.1f} {ratio:>7.2f}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline del semáforo")
+    parser.add_argument("--filas", default=",".join(str(t) for t in TAMANOS), help="tamaños separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--limite", type=float, default=10.0, help="segundos a partir de los cuales una etapa deja de medirse en tamaños mayores")
+    parser.add_argument("--etapas", default="", help="medir solo estas etapas (separadas por comas)")
+    parser.add_argument("--salida", help="fichero JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior; termina con error si hay regresiones")
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.filas.split(",") if t]
+    solo = {e.strip() for e in args.etapas.split(",") if e.strip()}
+    actual = ejecutar(tamanos, args.repeticiones, args.limite, solo)
+
+    salida = args.salida
+    if not salida:
+        os.makedirs(CARPETA_RESULTADOS, exist_ok=True)
+        salida = os.path.join(CARPETA_RESULTADOS, f"semaforo_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(actual, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        if comparar(actual, anterior):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# --- GENERADOR DE CLIENTES SINTÉTICOS ---
+# Tablas con la misma forma que devuelve accion=clientes: las columnas de
+# COLUMNAS_BASE, 3 filas (días hábiles consecutivos) por cliente y fechas en ISO.
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semaforo import COLUMNAS_BASE  # noqa: E402
+
+FLAGS_COORDINACION = ["F2025", "F2026", "HL"]
+ESTADOS_FLAG = np.array(["✔", "❌", ""], dtype=object)
+
+
+def festivos_nacionales(anios):
+    fijos = [(1, 1), (1, 6), (5, 1), (8, 15), (10, 12), (11, 1), (12, 6), (12, 8), (12, 25)]
+    return {date(a, m, d) for a in anios for m, d in fijos}
+
+
+def _flags(rng, n, prob_check):
+    return ESTADOS_FLAG[rng.choice(3, size=n, p=[prob_check, 0.9 - prob_check, 0.1])]
+
+
+def generar_clientes(filas, hoy=None, festivos=None, semilla=0, dias_historia=260):
+    if hoy is None:
+        hoy = date.today()
+    if festivos is None:
+        festivos = festivos_nacionales(range(hoy.year - 2, hoy.year + 2))
+    rng = np.random.default_rng(semilla)
+    calendario = np.busdaycalendar(holidays=np.array(sorted(festivos), dtype="datetime64[D]"))
+
+    n_clientes = max(1, filas // 3)
+    hoy_np = np.datetime64(hoy, "D")
+
+    # Entrada en un día hábil del último año; los 3 días del semáforo son hábiles consecutivos
+    atraso = rng.integers(0, dias_historia, size=n_clientes)
+    entrada = np.busday_offset(hoy_np, -atraso, roll="backward", busdaycal=calendario)
+    dias = np.busday_offset(np.repeat(entrada, 3), np.tile([0, 1, 2], n_clientes), roll="forward", busdaycal=calendario)
+    antiguedad = np.busday_count(entrada, hoy_np + 1, busdaycal=calendario)
+
+    # Closer para una parte de los clientes ya pasados de día 3; Supercloser a partir del día 5
+    con_closer = (antiguedad >= 3) & (rng.random(n_clientes) < 0.4)
+    con_super = con_closer & (antiguedad >= 5) & (rng.random(n_clientes) < 0.3)
+    closers = np.array([f"CLOSER {i:02d}" for i in range(10)], dtype=object)
+    supers = np.array([f"SUPER {i:02d}" for i in range(4)], dtype=object)
+    asignado_closer = np.where(con_closer, closers[rng.integers(0, len(closers), n_clientes)], "")
+    asignado_super = np.where(con_super, supers[rng.integers(0, len(supers), n_clientes)], "")
+    fecha_closer = np.where(con_closer, np.busday_offset(entrada, 3, roll="forward", busdaycal=calendario).astype(str), "")
+    fecha_super = np.where(con_super, np.busday_offset(entrada, 5, roll="forward", busdaycal=calendario).astype(str), "")
+    estado = np.array(["", "CERRADO", "FINALIZADO", "ESCALAR A CENTRAL"], dtype=object)[
+        rng.choice(4, size=n_clientes, p=[0.8, 0.1, 0.07, 0.03])
+    ]
+
+    cal = np.array([f"CAL{i:02d}" for i in range(20)], dtype=object)[rng.integers(0, 20, n_clientes)]
+    comercial = np.array([f"COMERCIAL {i:03d}" for i in range(200)], dtype=object)[rng.integers(0, 200, n_clientes)]
+    cliente = np.array([f"CLIENTE {i:07d} S.L." for i in range(n_clientes)], dtype=object)
+
+    def por_fila(valores):
+        return np.repeat(np.asarray(valores, dtype=object), 3)
+
+    n = 3 * n_clientes
+    datos = {
+        "CAL": por_fila(cal),
+        "COMERCIAL": por_fila(comercial),
+        "CLIENTE": por_fila(cliente),
+        "DIA": dias.astype(str).astype(object),
+        "SEMAFORO": np.full(n, "", dtype=object),
+        "FECHA_ENTRADA": por_fila(entrada.astype(str)),
+        "ASIGNADO_CLOSER": por_fila(asignado_closer),
+        "FECHA_ASIGNACION_CLOSER": por_fila(fecha_closer),
+        "ASIGNADO_SUPERCLOSER": por_fila(asignado_super),
+        "FECHA_ASIGNACION_SUPERCLOSER": por_fila(fecha_super),
+        "ESTADO_CIERRE": por_fila(estado),
+        "SEGUIMIENTO_CLOSER": por_fila(np.where(con_closer, "Llamado, pendiente de respuesta", "")),
+        "SEGUIMIENTO_SUPERCLOSER": por_fila(np.where(con_super, "Revisado con el cliente", "")),
+    }
+    # Coordinación marca sobre todo ❌; Closer y Supercloser solo si tienen el cliente
+    for p in FLAGS_COORDINACION:
+        datos[p] = _flags(rng, n, 0.25)
+        datos[f"CLOSER_{p}"] = np.where(por_fila(con_closer).astype(bool), _flags(rng, n, 0.35), "")
+        datos[f"SUPERCLOSER_{p}"] = np.where(por_fila(con_super).astype(bool), _flags(rng, n, 0.45), "")
+
+    return pd.DataFrame(datos, columns=COLUMNAS_BASE)
@@ -0,0 +1,92 @@
+# --- ÍNDICE DE BÚSQUEDA DE CLIENTES ---
+# Se construye una vez por versión de datos y se reutiliza en todos los reruns:
+# - un conjunto con los nombres de cliente normalizados para detectar duplicados
+# - un índice de trigramas por columna (CAL, COMERCIAL, CLIENTE) para buscar texto
+#   contenido sin recorrer todo el DataFrame
+# - un detector de nombres parecidos (duplicados.py), creado al primer uso
+import numpy as np
+import pandas as pd
+
+from duplicados import DetectorDuplicados
+
+COLUMNAS_BUSQUEDA = ["CAL", "COMERCIAL", "CLIENTE"]
+N = 3
+
+
+def normalizar_nombre(nombre):
+    # La misma normalización que usaba la comprobación de duplicados
+    return str(nombre).strip().upper()
+
+
+def trigramas(texto):
+    return {texto[i:i + N] for i in range(len(texto) - N + 1)}
+
+
+class IndiceColumna:
+    def __init__(self, serie):
+        # Cada fila apunta a su valor distinto; los trigramas apuntan a valores distintos
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+        self.codigos = codigos
+        self.valores = [str(v).lower() for v in unicos]
+        postings = {}
+        for i, valor in enumerate(self.valores):
+            for t in trigramas(valor):
+                postings.setdefault(t, []).append(i)
+        self.postings = {t: np.array(ids, dtype=np.int64) for t, ids in postings.items()}
+
+    def valores_con(self, texto):
+        # Ids de los valores que contienen `texto` (sin distinguir mayúsculas)
+        texto = texto.lower()
+        if len(texto) < N:
+            return [i for i, v in enumerate(self.valores) if texto in v]
+        listas = [self.postings.get(t) for t in trigramas(texto)]
+        if any(lista is None for lista in listas):
+            return []
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+            if len(candidatos) == 0:
+                return []
+        # Los trigramas no garantizan el orden: se confirma cada candidato
+        return [i for i in candidatos.tolist() if texto in self.valores[i]]
+
+    def mascara(self, texto):
+        return np.isin(self.codigos, self.valores_con(texto))
+
+
+class IndiceClientes:
+    def __init__(self, df):
+        self.filas = len(df)
+        self.nombres = set(df["CLIENTE"].dropna().map(normalizar_nombre)) if "CLIENTE" in df.columns else set()
+        self.columnas = {col: IndiceColumna(df[col]) for col in COLUMNAS_BUSQUEDA if col in df.columns}
+        self._clientes = df["CLIENTE"].dropna().unique() if "CLIENTE" in df.columns else []
+        self._duplicados = None
+        self._grupos = None
+
+    def existe(self, cliente):
+        return normalizar_nombre(cliente) in self.nombres
+
+    @property
+    def duplicados(self):
+        if self._duplicados is None:
+            self._duplicados = DetectorDuplicados(self._clientes)
+        return self._duplicados
+
+    def grupos_duplicados(self):
+        # Modo lote sobre todos los clientes: se calcula una vez por índice (versión de datos)
+        if self._grupos is None:
+            self._grupos = self.duplicados.grupos()
+        return self._grupos
+
+    def parecidos(self, cliente):
+        # [(cliente existente, puntuación)] que probablemente son el mismo que `cliente`
+        return self.duplicados.buscar(cliente)
+
+    def mascara(self, filtros):
+        # Máscara por posición de las filas que contienen el texto de cada filtro
+        mascara = np.ones(self.filas, dtype=bool)
+        for col, indice in self.columnas.items():
+            if filtros.get(col):
+                mascara &= indice.mascara(filtros[col])
+        return mascara
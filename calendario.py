@@ -0,0 +1,149 @@
+# --- CALENDARIO LABORAL ---
+# Cálculo de días hábiles (lunes a viernes, sin festivos) sobre fechas sueltas y columnas completas
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+
+from tiempos import cronometrado
+
+
+# Días desde 1970-01-01 (un jueves); es la misma escala que datetime64[D]
+EPOCA = date(1970, 1, 1)
+MARGEN_DIAS = 2 * 366
+
+
+def dia_numero(fecha):
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    return (fecha - EPOCA).days
+
+
+def numero_dia(numero):
+    return EPOCA + timedelta(days=int(numero))
+
+
+class CalendarioLaboral:
+    # Días hábiles (lunes a viernes, sin festivos) precalculados sobre un rango de
+    # fechas. Con `previos[k]` = nº de días hábiles anteriores al día k del rango y
+    # `habiles` = lista ordenada de días hábiles, cada consulta es un acceso a array.
+    # Si llega una fecha fuera del rango, el rango se amplía (una vez) y se recalcula.
+    def __init__(self, festivos, desde=None, hasta=None):
+        self.festivos = frozenset(festivos)
+        hoy = date.today()
+        extremos = [hoy, *self.festivos]
+        desde = dia_numero(desde or min(extremos)) - MARGEN_DIAS
+        hasta = dia_numero(hasta or max(extremos)) + MARGEN_DIAS
+        self._construir(desde, hasta)
+
+    def _construir(self, desde, hasta):
+        dias = np.arange(desde, hasta + 1, dtype=np.int64)
+        festivos = np.array([dia_numero(f) for f in self.festivos], dtype=np.int64)
+        laborable = ((dias + 3) % 7 < 5) & ~np.isin(dias, festivos)
+        self.inicio = desde
+        self.fin = hasta
+        self.habiles = dias[laborable]
+        self.previos = np.concatenate(([0], np.cumsum(laborable)))
+
+    def _asegurar(self, minimo, maximo):
+        if minimo - 31 < self.inicio or maximo + 31 > self.fin:
+            self._construir(min(self.inicio, minimo - MARGEN_DIAS), max(self.fin, maximo + MARGEN_DIAS))
+
+    def _previos(self, numero):
+        return int(self.previos[numero - self.inicio])
+
+    def es_habil(self, fecha):
+        k = dia_numero(fecha)
+        self._asegurar(k, k)
+        return self._previos(k + 1) > self._previos(k)
+
+    def siguiente_habil(self, fecha):
+        # La propia fecha si es hábil; si no, el primer día hábil posterior
+        k = dia_numero(fecha)
+        self._asegurar(k, k)
+        return numero_dia(self.habiles[self._previos(k)])
+
+    def sumar_habiles(self, fecha, n):
+        # El n-ésimo día hábil después de `fecha` (antes, si n < 0); con n = 0, siguiente_habil
+        if n == 0:
+            return self.siguiente_habil(fecha)
+        k = dia_numero(fecha)
+        self._asegurar(k - 2 * abs(n) - 7, k + 2 * abs(n) + 7)
+        posicion = self._previos(k + 1) + n - 1 if n > 0 else self._previos(k) + n
+        return numero_dia(self.habiles[posicion])
+
+    def habiles_entre(self, desde, hasta):
+        # Días hábiles de `desde` a `hasta`, ambos incluidos (0 si desde > hasta)
+        a, b = dia_numero(desde), dia_numero(hasta)
+        self._asegurar(min(a, b), max(a, b))
+        return max(0, self._previos(b + 1) - self._previos(a))
+
+    def sumar_habiles_array(self, dias, n):
+        # sumar_habiles para un array de días (datetime64[D]); devuelve datetime64[D]
+        a = dias.astype("datetime64[D]").astype(np.int64)
+        if len(a) == 0:
+            return np.array([], dtype="datetime64[D]")
+        self._asegurar(int(a.min()) - 2 * abs(n) - 7, int(a.max()) + 2 * abs(n) + 7)
+        if n > 0:
+            posicion = self.previos[a + 1 - self.inicio] + n - 1
+        else:
+            posicion = self.previos[a - self.inicio] + n
+        return self.habiles[posicion].astype("datetime64[D]")
+
+    def habiles_entre_array(self, desde, hasta):
+        # Igual que habiles_entre para un array de días (datetime64[D]) hasta una fecha fija
+        a = desde.astype("datetime64[D]").astype(np.int64)
+        b = dia_numero(hasta)
+        if len(a) == 0:
+            return np.zeros(0, dtype=np.int64)
+        self._asegurar(min(int(a.min()), b), max(int(a.max()), b))
+        return np.clip(self.previos[b + 1 - self.inicio] - self.previos[a - self.inicio], 0, None)
+
+
+@functools.lru_cache(maxsize=8)
+def _calendario_para(festivos):
+    return CalendarioLaboral(festivos)
+
+
+def calendario_laboral(festivos):
+    # Un único calendario por conjunto de festivos, compartido por toda la app
+    if isinstance(festivos, CalendarioLaboral):
+        return festivos
+    return _calendario_para(frozenset(festivos))
+
+
+@cronometrado("dias_habiles")
+def dias_habiles_serie(fechas, festivos, hoy=None):
+    # Días hábiles entre cada fecha y hoy, ambos incluidos. NaT o fecha futura → 0.
+    # `festivos` puede ser el conjunto de fechas o un CalendarioLaboral ya construido
+    if hoy is None:
+        hoy = datetime.now().date()
+
+    fechas = pd.to_datetime(pd.Series(fechas), errors="coerce")
+    dias = fechas.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    validas = ~np.isnat(dias)
+
+    resultado = np.zeros(len(dias), dtype=np.int64)
+    if validas.any():
+        resultado[validas] = calendario_laboral(festivos).habiles_entre_array(dias[validas], hoy)
+
+    return pd.Series(resultado, index=fechas.index)
+
+
+# --- COPIA LOCAL DE FESTIVOS ---
+def guardar_festivos(ruta, festivos):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump([d.isoformat() for d in sorted(festivos)], f)
+    os.replace(temporal, ruta)
+
+
+def leer_festivos(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return {pd.to_datetime(d).date() for d in json.load(f)}
+    except (OSError, ValueError):
+        return set()
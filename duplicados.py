@@ -0,0 +1,123 @@
+# --- DETECCIÓN DE CLIENTES DUPLICADOS ---
+# Compara nombres normalizados (sin acentos, puntuación ni forma jurídica) para que
+# "ACME S.L." y "Acme, SL" cuenten como el mismo cliente. Para no comparar cada
+# nombre con todos, un nombre nuevo solo se puntúa contra los que comparten bloque
+# (prefijo de alguna palabra) y el modo lote usa vecindarios ordenados. La similitud
+# es el coeficiente de Dice sobre trigramas de caracteres.
+import re
+import unicodedata
+
+UMBRAL = 0.85
+# Bloques más grandes que esto (palabras muy comunes) no sirven para acotar candidatos
+MAX_BLOQUE = 500
+LARGO_PREFIJO = 4
+# Vecinos con los que se compara cada nombre en el modo lote
+VENTANA = 10
+
+SUFIJOS_LEGALES = {
+    "SL", "SLU", "SLL", "SLNE", "SLP", "SA", "SAU", "SAL", "SC", "SCP", "CB", "SCOOP", "COOP",
+    "SOCIEDAD", "LIMITADA", "ANONIMA", "UNIPERSONAL", "LABORAL", "PROFESIONAL", "COOPERATIVA",
+}
+PALABRAS_VACIAS = {"DE", "DEL", "LA", "LAS", "EL", "LOS", "Y", "E"}
+
+
+def clave_nombre(nombre):
+    # "Cafés Pérez, S.L.U." → "CAFES PEREZ"
+    texto = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode("ascii").upper()
+    texto = texto.replace(".", "")
+    palabras = re.sub(r"[^\w]+", " ", texto).split()
+    utiles = [p for p in palabras if p not in SUFIJOS_LEGALES and p not in PALABRAS_VACIAS]
+    return " ".join(utiles or palabras)
+
+
+def trigramas(clave):
+    texto = f"  {clave} "
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+def similitud(a, b):
+    # Dice sobre dos conjuntos de trigramas
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def numeros(clave):
+    return frozenset(p for p in clave.split() if p.isdigit())
+
+
+class DetectorDuplicados:
+    def __init__(self, nombres):
+        # Un registro por clave normalizada; varios nombres originales pueden compartirla
+        self.originales = {}
+        for nombre in nombres:
+            if nombre is None or str(nombre).strip() == "":
+                continue
+            self.originales.setdefault(clave_nombre(nombre), []).append(str(nombre))
+        self.claves = list(self.originales)
+        self.trigramas = [trigramas(c) for c in self.claves]
+        self.bloques = {}
+        for i, clave in enumerate(self.claves):
+            for b in self._bloques(clave):
+                self.bloques.setdefault(b, []).append(i)
+
+    @staticmethod
+    def _bloques(clave):
+        return {p[:LARGO_PREFIJO] for p in clave.split()}
+
+    def _candidatos(self, clave):
+        bloques = [self.bloques.get(b, []) for b in self._bloques(clave)]
+        utiles = [b for b in bloques if len(b) <= MAX_BLOQUE]
+        if not utiles and bloques:
+            # Todas las palabras son comunes: se usa solo el bloque más pequeño
+            utiles = [min(bloques, key=len)]
+        candidatos = set()
+        for b in utiles:
+            candidatos.update(b)
+        return candidatos
+
+    def _parecidos(self, clave, tri, i):
+        # Dos nombres con números distintos ("OFICINA 2" / "OFICINA 3") no son el mismo
+        if numeros(clave) != numeros(self.claves[i]):
+            return 0.0
+        return similitud(tri, self.trigramas[i])
+
+    def buscar(self, nombre, umbral=UMBRAL, limite=5):
+        # [(nombre existente, puntuación)] de los más parecidos a `nombre`, de mayor a menor
+        clave = clave_nombre(nombre)
+        if clave in self.originales:
+            return [(original, 1.0) for original in self.originales[clave]][:limite]
+        tri = trigramas(clave)
+        resultados = []
+        for i in self._candidatos(clave):
+            puntuacion = self._parecidos(clave, tri, i)
+            if puntuacion >= umbral:
+                resultados.extend((original, round(puntuacion, 3)) for original in self.originales[self.claves[i]])
+        resultados.sort(key=lambda r: -r[1])
+        return resultados[:limite]
+
+    def grupos(self, umbral=UMBRAL, ventana=VENTANA):
+        # Modo lote: grupos (de 2 o más nombres originales) que parecen el mismo cliente.
+        # Vecindario ordenado: cada clave se compara solo con las `ventana` siguientes,
+        # una vez en orden alfabético y otra con las palabras al revés (errores al final
+        # y al principio del nombre). Los nombres con la misma clave ya van juntos.
+        padre = list(range(len(self.claves)))
+
+        def raiz(i):
+            while padre[i] != i:
+                padre[i] = padre[padre[i]]
+                i = padre[i]
+            return i
+
+        invertidas = [" ".join(reversed(c.split())) for c in self.claves]
+        for orden in (sorted(range(len(self.claves)), key=self.claves.__getitem__),
+                      sorted(range(len(self.claves)), key=invertidas.__getitem__)):
+            for posicion, i in enumerate(orden):
+                for j in orden[posicion + 1:posicion + 1 + ventana]:
+                    if raiz(i) != raiz(j) and self._parecidos(self.claves[i], self.trigramas[i], j) >= umbral:
+                        padre[raiz(j)] = raiz(i)
+
+        por_raiz = {}
+        for i, clave in enumerate(self.claves):
+            por_raiz.setdefault(raiz(i), []).extend(self.originales[clave])
+        return sorted((g for g in por_raiz.values() if len(g) > 1), key=len, reverse=True)
@@ -0,0 +1,216 @@
+# --- EXPORTACIÓN A EXCEL, CSV Y PARQUET ---
+# Los escritores recorren el DataFrame por bloques y vuelcan fila a fila (xlsx en
+# modo write-only, CSV con el módulo csv, Parquet por lotes), así que la memoria no
+# crece con el tamaño de la exportación. El resultado va a un archivo temporal que
+# solo pasa a disco si supera TAMANO_EN_MEMORIA.
+#
+# Los Excel de ROJOS vencidos se escriben además en un hilo aparte para no bloquear
+# el rerun, y solo si su contenido ha cambiado desde la última exportación (se
+# compara un hash de las filas, guardado junto al archivo).
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_BLOQUE = 5_000
+TAMANO_EN_MEMORIA = 8 * 1024 * 1024  # bytes antes de pasar el temporal a disco
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en curso"
+TERMINADO = "terminado"
+SIN_CAMBIOS = "sin cambios"
+ERROR = "error"
+
+
+def _valor_celda(valor):
+    # Tipos que entienden openpyxl y csv: NaN/NaT vacíos, fechas sin hora como date
+    if valor is None or valor is pd.NaT or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.date() if valor == valor.normalize() else valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def filas_por_bloques(df, tamano=FILAS_POR_BLOQUE):
+    # Solo se convierte a objetos Python un bloque de filas cada vez
+    for inicio in range(0, len(df), tamano):
+        for fila in df.iloc[inicio:inicio + tamano].itertuples(index=False, name=None):
+            yield [_valor_celda(v) for v in fila]
+
+
+def escribir_xlsx(df, destino, hoja="Datos"):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    pagina = libro.create_sheet(hoja)
+    pagina.append([str(c) for c in df.columns])
+    for fila in filas_por_bloques(df):
+        pagina.append(fila)
+    libro.save(destino)
+
+
+def escribir_csv(df, destino):
+    # utf-8-sig para que Excel reconozca los acentos y los ✔/❌ al abrir el CSV
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    try:
+        escritor = csv.writer(texto, delimiter=";")
+        escritor.writerow(df.columns)
+        for fila in filas_por_bloques(df):
+            escritor.writerow(["" if v is None else v.isoformat() if isinstance(v, date) else v for v in fila])
+    finally:
+        texto.detach()
+
+
+def _esquema_parquet(df):
+    # Tipos reales de cada columna. Las object se infieren sobre la columna entera
+    # (fechas, números, texto); solo las que mezclan tipos se escriben como texto.
+    import pyarrow as pa
+
+    tipos_object = {
+        "string": pa.string(), "empty": pa.string(), "date": pa.date32(), "datetime": pa.timestamp("us"),
+        "integer": pa.int64(), "floating": pa.float64(), "mixed-integer-float": pa.float64(), "boolean": pa.bool_(),
+    }
+    esquema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    a_texto = []
+    for posicion, col in enumerate(df.columns):
+        if df[col].dtype == object:
+            inferido = pd.api.types.infer_dtype(df[col], skipna=True)
+            if inferido not in tipos_object:
+                a_texto.append(col)
+            tipo = tipos_object.get(inferido, pa.string())
+            esquema = esquema.set(posicion, pa.field(str(col), tipo))
+    return esquema, a_texto
+
+
+def escribir_parquet(df, destino):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema, a_texto = _esquema_parquet(df)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for inicio in range(0, max(len(df), 1), FILAS_POR_BLOQUE):
+            bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+            if a_texto:
+                bloque = bloque.copy()
+                for col in a_texto:
+                    # Los vacíos siguen siendo nulos, no el texto "nan"
+                    bloque[col] = bloque[col].astype(str).where(bloque[col].notna(), None)
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+
+
+# extensión → (tipo MIME, escritor)
+FORMATOS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", escribir_xlsx),
+    "csv": ("text/csv", escribir_csv),
+    "parquet": ("application/vnd.apache.parquet", escribir_parquet),
+}
+
+
+def formatos_disponibles():
+    # Parquet solo si pyarrow está instalado
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return [f for f in FORMATOS if f != "parquet"]
+    return list(FORMATOS)
+
+
+def exportar_temporal(df, formato):
+    # Archivo temporal (en memoria hasta TAMANO_EN_MEMORIA, luego en disco) ya rebobinado
+    _, escritor = FORMATOS[formato]
+    archivo = tempfile.SpooledTemporaryFile(max_size=TAMANO_EN_MEMORIA)
+    escritor(df, archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def hash_contenido(df):
+    # Independiente del orden de filas y del índice: mismas filas → mismo hash
+    texto = df.astype(str)
+    ordenado = texto.sort_values(list(texto.columns), kind="stable").reset_index(drop=True)
+    huella = hashlib.sha256()
+    huella.update("\x1f".join(map(str, ordenado.columns)).encode("utf-8"))
+    huella.update(pd.util.hash_pandas_object(ordenado, index=False).to_numpy().tobytes())
+    return huella.hexdigest()
+
+
+def leer_hash(ruta):
+    try:
+        with open(f"{ruta}.sha256", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def guardar_hash(ruta, valor):
+    with open(f"{ruta}.sha256", "w", encoding="utf-8") as f:
+        f.write(valor)
+
+
+class ExportadorSegundoPlano:
+    def __init__(self, hilos=1):
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="exportacion")
+        self.bloqueo = threading.Lock()
+        # ruta → {"estado", "filas", "hash", "error", "fecha"}
+        self.trabajos = {}
+        self.hashes = {}
+
+    def exportar(self, df, ruta, valor=None):
+        # Encola la escritura de `df` en `ruta` (xlsx) si su contenido ha cambiado.
+        # `valor` es su hash_contenido si ya se conoce. Devuelve el estado del trabajo.
+        if valor is None:
+            valor = hash_contenido(df)
+        with self.bloqueo:
+            trabajo = self.trabajos.get(ruta)
+            if trabajo and trabajo["hash"] == valor and trabajo["estado"] in (PENDIENTE, EN_CURSO, TERMINADO, SIN_CAMBIOS):
+                return dict(trabajo)
+            if self.hashes.get(ruta, leer_hash(ruta)) == valor and os.path.exists(ruta):
+                self.hashes[ruta] = valor
+                trabajo = self._anotar(ruta, SIN_CAMBIOS, len(df), valor)
+                return dict(trabajo)
+            trabajo = self._anotar(ruta, PENDIENTE, len(df), valor)
+
+        # Copia propia: el DataFrame del rerun puede cambiar mientras el hilo escribe
+        self.ejecutor.submit(self._escribir, df.copy(), ruta, valor)
+        return dict(trabajo)
+
+    def trabajo(self, ruta):
+        # Último trabajo de `ruta` (o None) sin volver a calcular ningún hash
+        with self.bloqueo:
+            trabajo = self.trabajos.get(ruta)
+            return dict(trabajo) if trabajo else None
+
+    def _anotar(self, ruta, estado, filas, valor, error=None):
+        trabajo = {"estado": estado, "filas": filas, "hash": valor, "error": error,
+                   "fecha": datetime.now().isoformat(timespec="seconds")}
+        self.trabajos[ruta] = trabajo
+        return trabajo
+
+    def _escribir(self, df, ruta, valor):
+        with self.bloqueo:
+            if self.trabajos.get(ruta, {}).get("hash") != valor:
+                return  # Ya hay un trabajo más reciente para esta ruta
+            self._anotar(ruta, EN_CURSO, len(df), valor)
+        try:
+            temporal = f"{ruta}.tmp"
+            with open(temporal, "wb") as f:
+                escribir_xlsx(df, f)
+            os.replace(temporal, ruta)
+            guardar_hash(ruta, valor)
+        except Exception as e:
+            with self.bloqueo:
+                self._anotar(ruta, ERROR, len(df), valor, error=str(e))
+            return
+        with self.bloqueo:
+            self.hashes[ruta] = valor
+            if self.trabajos.get(ruta, {}).get("hash") == valor:
+                self._anotar(ruta, TERMINADO, len(df), valor)
@@ -0,0 +1,264 @@
+# --- IMPORTACIÓN MASIVA DE CLIENTES (CSV / EXCEL) ---
+# Los coordinadores reciben los leads en hojas de cálculo. El archivo se lee fila a
+# fila (csv.reader sobre el flujo subido, openpyxl en modo read-only para xlsx), se
+# validan y normalizan CAL, COMERCIAL y CLIENTE, se descartan los clientes que ya
+# existen o se repiten dentro del archivo y los válidos se envían por lotes con
+# insertar_clientes: cada cliente lleva sus 3 filas de días hábiles, igual que en
+# el formulario de alta. Cada fila del archivo acaba en el informe con su estado.
+import csv
+import io
+import re
+import unicodedata
+
+from api_semaforo import ErrorAPI
+from busqueda import normalizar_nombre
+from duplicados import DetectorDuplicados, clave_nombre
+from semaforo import fila_insercion, filas_nuevo_cliente
+
+COLUMNAS_IMPORTACION = ["CAL", "COMERCIAL", "CLIENTE"]
+OBLIGATORIAS = ["COMERCIAL", "CLIENTE"]
+LARGO_MAXIMO = 120
+# Clientes por petición a insertar_clientes (3 filas por cliente)
+CLIENTES_POR_LOTE = 100
+MUESTRA_CSV = 64 * 1024  # bytes para detectar codificación y separador
+
+IMPORTADO = "importado"
+OMITIDO = "omitido"
+ERROR = "error"
+SIN_CONFIRMAR = "sin confirmar"
+VALIDO = "válido"
+
+# Otras cabeceras habituales en las hojas de leads
+ALIAS_CABECERAS = {
+    "COORDINADOR": "CAL",
+    "COORDINACION": "CAL",
+    "VENDEDOR": "COMERCIAL",
+    "NOMBRE": "CLIENTE",
+    "EMPRESA": "CLIENTE",
+    "RAZON SOCIAL": "CLIENTE",
+}
+
+
+def normalizar_texto(valor):
+    # Espacios repetidos, tabuladores y saltos de línea fuera; None y NaN → ""
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return ""
+    return re.sub(r"\s+", " ", str(valor)).strip()
+
+
+def normalizar_cabecera(cabecera):
+    texto = unicodedata.normalize("NFKD", normalizar_texto(cabecera)).encode("ascii", "ignore").decode("ascii")
+    texto = re.sub(r"[^\w]+", " ", texto.upper()).strip()
+    return ALIAS_CABECERAS.get(texto, texto)
+
+
+def _columnas(cabeceras):
+    # posición → columna reconocida (la primera si se repite)
+    columnas = {}
+    for posicion, cabecera in enumerate(cabeceras):
+        nombre = normalizar_cabecera(cabecera)
+        if nombre in COLUMNAS_IMPORTACION and nombre not in columnas.values():
+            columnas[posicion] = nombre
+    faltan = [c for c in OBLIGATORIAS if c not in columnas.values()]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+    return columnas
+
+
+def _con_columnas(filas):
+    # La primera fila no vacía es la cabecera; numero es la fila en la hoja (1 = cabecera)
+    columnas = None
+    for numero, valores in filas:
+        if columnas is None:
+            if any(normalizar_texto(v) for v in valores):
+                columnas = _columnas(valores)
+            continue
+        if not any(normalizar_texto(v) for v in valores):
+            continue
+        yield numero, {col: valores[pos] if pos < len(valores) else None for pos, col in columnas.items()}
+    if columnas is None:
+        raise ValueError("El archivo está vacío")
+
+
+class _PuntoYComa(csv.excel):
+    # El CSV que exporta Excel en español
+    delimiter = ";"
+
+
+def _leer_csv(archivo):
+    muestra = archivo.read(MUESTRA_CSV)
+    archivo.seek(0)
+    try:
+        muestra.decode("utf-8")
+        codificacion = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Un carácter partido al final de la muestra no indica latin-1
+        codificacion = "utf-8-sig" if e.start >= len(muestra) - 3 else "latin-1"
+    texto = io.TextIOWrapper(archivo, encoding=codificacion, newline="")
+    try:
+        try:
+            dialecto = csv.Sniffer().sniff(muestra.decode(codificacion, "ignore"), delimiters=";,\t|")
+        except csv.Error:
+            dialecto = _PuntoYComa
+        yield from enumerate(csv.reader(texto, dialecto), start=1)
+    finally:
+        texto.detach()
+
+
+def _leer_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from enumerate(libro.worksheets[0].iter_rows(values_only=True), start=1)
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    # (número de fila, {CAL, COMERCIAL, CLIENTE}) sin cargar el archivo entero en memoria
+    extension = nombre.rsplit(".", 1)[-1].lower()
+    if extension in ("xlsx", "xlsm"):
+        filas = _leer_xlsx(archivo)
+    elif extension in ("csv", "txt"):
+        filas = _leer_csv(archivo)
+    else:
+        raise ValueError(f"Formato no soportado: .{extension} (usa CSV o XLSX)")
+    return _con_columnas(filas)
+
+
+def validar_fila(valores, cal_defecto, usuarios=None):
+    # (datos normalizados, None) o (None, motivo del rechazo). `usuarios` es
+    # {USUARIO EN MAYÚSCULAS: usuario} con los CAL admitidos
+    datos = {col: normalizar_texto(valores.get(col)) for col in COLUMNAS_IMPORTACION}
+    for col in OBLIGATORIAS:
+        if not datos[col]:
+            return None, f"{col} vacío"
+    for col, valor in datos.items():
+        if len(valor) > LARGO_MAXIMO:
+            return None, f"{col} demasiado largo ({len(valor)} caracteres)"
+    if not re.search(r"\w", datos["CLIENTE"]):
+        return None, "CLIENTE sin letras ni números"
+
+    cal = datos["CAL"] or cal_defecto
+    if usuarios is not None:
+        # Se guarda con la grafía del usuario registrado
+        if cal.upper() not in usuarios:
+            return None, f"CAL desconocido: {cal}"
+        cal = usuarios[cal.upper()]
+    datos["CAL"] = cal
+    return datos, None
+
+
+def preparar_importacion(filas, indice, cal_defecto, usuarios=None, forzar=False):
+    # Valida y deduplica. Devuelve (clientes a insertar, informe por fila); los
+    # clientes llevan su FILA para poder completar el informe al enviarlos.
+    informe = []
+    clientes = []
+    vistos = {}  # nombre normalizado o clave → fila del archivo que lo trajo
+    if usuarios is not None:
+        usuarios = {str(u).strip().upper(): u for u in usuarios}
+    for numero, valores in filas:
+        datos, motivo = validar_fila(valores, cal_defecto, usuarios)
+        cliente = normalizar_texto(valores.get("CLIENTE"))
+        if motivo:
+            informe.append(_entrada(numero, cliente, ERROR, motivo))
+            continue
+        cliente = datos["CLIENTE"]
+        if indice.existe(cliente):
+            informe.append(_entrada(numero, cliente, OMITIDO, "Ya existe en el semáforo"))
+            continue
+        repetido = vistos.get(normalizar_nombre(cliente)) or vistos.get(clave_nombre(cliente))
+        if repetido:
+            informe.append(_entrada(numero, cliente, OMITIDO, f"Repetido en el archivo (fila {repetido})"))
+            continue
+        if not forzar:
+            parecidos = indice.parecidos(cliente)
+            if parecidos:
+                nombres = ", ".join(f"{nombre} ({puntuacion:.0%})" for nombre, puntuacion in parecidos)
+                informe.append(_entrada(numero, cliente, OMITIDO, f"Se parece a clientes existentes: {nombres}"))
+                continue
+        vistos[normalizar_nombre(cliente)] = vistos[clave_nombre(cliente)] = numero
+        clientes.append({"FILA": numero, **datos})
+        informe.append(_entrada(numero, cliente, VALIDO, ""))
+
+    if not forzar and len(clientes) > 1:
+        clientes = _quitar_parecidos_internos(clientes, informe)
+    return clientes, informe
+
+
+def _quitar_parecidos_internos(clientes, informe):
+    # Nombres del archivo que se parecen entre sí: se queda el primero de cada grupo
+    fila_de = {c["CLIENTE"]: c["FILA"] for c in reversed(clientes)}
+    descartados = {}
+    for grupo in DetectorDuplicados([c["CLIENTE"] for c in clientes]).grupos():
+        primero = min(grupo, key=fila_de.__getitem__)
+        for nombre in grupo:
+            if nombre != primero:
+                descartados[fila_de[nombre]] = fila_de[primero]
+    if not descartados:
+        return clientes
+    for entrada in informe:
+        if entrada["FILA"] in descartados and entrada["ESTADO"] == VALIDO:
+            entrada["ESTADO"] = OMITIDO
+            entrada["MOTIVO"] = f"Se parece al cliente de la fila {descartados[entrada['FILA']]}"
+    return [c for c in clientes if c["FILA"] not in descartados]
+
+
+def _entrada(numero, cliente, estado, motivo):
+    return {"FILA": numero, "CLIENTE": cliente, "ESTADO": estado, "MOTIVO": motivo}
+
+
+def filas_cliente(cliente, fecha_entrada, calendario):
+    # Las 3 filas del cliente, igual que en el formulario de alta, en el formato de la API
+    filas = filas_nuevo_cliente(cliente["CAL"], cliente["COMERCIAL"], cliente["CLIENTE"], fecha_entrada, calendario)
+    return [fila_insercion(fila) for fila in filas]
+
+
+def enviar_importacion(api, clientes, informe, fecha_entrada, calendario, tamano=CLIENTES_POR_LOTE, progreso=None):
+    # Un insertar_clientes por lote (todo o nada en el servidor). Si el servidor
+    # rechaza el lote se reintenta cliente a cliente para saber qué filas no entran;
+    # si no se sabe qué ha pasado (timeout, conexión cortada) no se reintenta, porque
+    # el lote pudo guardarse y se duplicarían los clientes: quedan como SIN_CONFIRMAR.
+    # `progreso(enviados, total)` se llama tras cada lote. Devuelve los importados.
+    por_fila = {entrada["FILA"]: entrada for entrada in informe}
+    importados = 0
+    for inicio in range(0, len(clientes), tamano):
+        lote = clientes[inicio:inicio + tamano]
+        try:
+            api.insertar_clientes([f for c in lote for f in filas_cliente(c, fecha_entrada, calendario)])
+            resultados = [(c, IMPORTADO, "") for c in lote]
+        except Exception as e:
+            if _rechazada(e) and len(lote) > 1:
+                resultados = [(c, *_enviar_uno(api, c, fecha_entrada, calendario)) for c in lote]
+            elif _rechazada(e):
+                resultados = [(c, ERROR, f"Rechazado por la API: {e}") for c in lote]
+            else:
+                resultados = [(c, SIN_CONFIRMAR, _motivo_sin_confirmar(e)) for c in lote]
+        for cliente, estado, motivo in resultados:
+            entrada = por_fila[cliente["FILA"]]
+            entrada["ESTADO"] = estado
+            entrada["MOTIVO"] = motivo
+            importados += estado == IMPORTADO
+        if progreso:
+            progreso(inicio + len(lote), len(clientes))
+    return importados
+
+
+def _enviar_uno(api, cliente, fecha_entrada, calendario):
+    try:
+        api.insertar_clientes(filas_cliente(cliente, fecha_entrada, calendario))
+    except Exception as e:
+        if _rechazada(e):
+            return ERROR, f"Rechazado por la API: {e}"
+        return SIN_CONFIRMAR, _motivo_sin_confirmar(e)
+    return IMPORTADO, ""
+
+
+def _rechazada(error):
+    # Solo un rechazo explícito del servidor garantiza que no se guardó nada
+    return isinstance(error, ErrorAPI) and error.rechazada
+
+
+def _motivo_sin_confirmar(error):
+    return f"Sin respuesta clara de la API ({error}): comprueba si se guardó antes de volver a importarlo"
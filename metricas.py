@@ -0,0 +1,227 @@
+# --- MÉTRICAS DEL PROCESO (formato de texto de Prometheus) ---
+# Histogramas y contadores acumulados desde que arrancó el proceso, alimentados
+# por cada rerun medido en tiempos.py. Se publican en un fichero, en un puerto
+# local o en ambos:
+#
+#   SEMAFORO_METRICAS_FICHERO=metricas.prom SEMAFORO_METRICAS_PUERTO=9108 streamlit run app.py
+#   curl http://127.0.0.1:9108/metrics
+#
+# El p95 de un rerun de Coordinación, por ejemplo, sale en Prometheus con
+#   histogram_quantile(0.95, sum by (le) (rate(semaforo_rerun_duracion_segundos_bucket{rol="COORDINADOR"}[1d])))
+import contextlib
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites superiores de los buckets, en segundos o en filas
+BUCKETS_API = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_RERUN = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+BUCKETS_ETAPA = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_FILAS = (10, 100, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+# Etapas cacheadas en app.py cuyo acierto/fallo se contabiliza
+ETAPAS_CACHE = {"cargar_clientes", "semaforo_coordinacion", "indice_coordinacion", "expirados_coordinacion",
+                 "rojos_coordinacion", "fechas_vacias_coordinacion"}
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.valores = {}
+
+    def sumar(self, *valores_etiquetas, cantidad=1):
+        self.valores[valores_etiquetas] = self.valores.get(valores_etiquetas, 0) + cantidad
+
+    def lineas(self):
+        for clave, valor in sorted(self.valores.items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, buckets, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(sorted(buckets))
+        self.etiquetas = tuple(etiquetas)
+        # clave → [cuentas por bucket (no acumuladas) + desbordamiento, suma, total]
+        self.series = {}
+
+    def observar(self, valor, *valores_etiquetas):
+        serie = self.series.get(valores_etiquetas)
+        if serie is None:
+            serie = self.series[valores_etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        serie[0][bisect_left(self.buckets, valor)] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def lineas(self):
+        nombres_le = self.etiquetas + ("le",)
+        for clave, (cuentas, suma, total) in sorted(self.series.items()):
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+                acumulado += cuenta
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                yield f"{self.nombre}_bucket{_etiquetas(nombres_le, clave + (le,))} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(round(suma, 6))}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}"
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self.bloqueo = threading.Lock()
+        self.bloqueo_fichero = threading.Lock()
+        self.api_latencia = Histograma(
+            "semaforo_api_latencia_segundos", "Duración de las llamadas a api_semaforo.php por accion.",
+            BUCKETS_API, ("accion",))
+        self.api_errores = Contador(
+            "semaforo_api_errores_total", "Llamadas a la API que terminaron en error, por accion y tipo.",
+            ("accion", "error"))
+        self.rerun_duracion = Histograma(
+            "semaforo_rerun_duracion_segundos", "Duración de cada rerun de la app por rol y sección.",
+            BUCKETS_RERUN, ("rol", "seccion"))
+        self.reruns_interrumpidos = Contador(
+            "semaforo_reruns_interrumpidos_total", "Reruns cortados por st.stop() o st.rerun().",
+            ("rol", "seccion"))
+        self.etapa_duracion = Histograma(
+            "semaforo_etapa_duracion_segundos", "Duración de las etapas de datos y de pintado.",
+            BUCKETS_ETAPA, ("categoria", "etapa"))
+        self.etapa_errores = Contador(
+            "semaforo_etapa_errores_total", "Etapas de datos o de pintado que lanzaron una excepción.",
+            ("categoria", "etapa", "error"))
+        self.filas_cargadas = Histograma(
+            "semaforo_filas_cargadas", "Filas de clientes devueltas por cada carga.",
+            BUCKETS_FILAS, ("etapa",))
+        self.cache_consultas = Contador(
+            "semaforo_cache_consultas_total", "Consultas a las cachés de la app por resultado (acierto/fallo).",
+            ("cache", "resultado"))
+        self.metricas = [
+            self.api_latencia, self.api_errores, self.rerun_duracion, self.reruns_interrumpidos,
+            self.etapa_duracion, self.etapa_errores, self.filas_cargadas, self.cache_consultas,
+        ]
+
+    def registrar_rerun(self, datos):
+        # datos es MedicionRerun.como_dict(): etiquetas del rerun, total_ms y etapas
+        rol = datos.get("rol") or "ANONIMO"
+        seccion = datos.get("seccion") or ""
+        with self.bloqueo:
+            if not datos.get("cerrado_tarde"):
+                self.rerun_duracion.observar(datos["total_ms"] / 1000, rol, seccion)
+            if datos.get("interrumpido"):
+                self.reruns_interrumpidos.sumar(rol, seccion)
+            for etapa in datos.get("etapas", []):
+                self._registrar_etapa(etapa)
+
+    def _registrar_etapa(self, etapa):
+        nombre, categoria = etapa["etapa"], etapa["categoria"]
+        segundos = etapa.get("duracion_ms", 0.0) / 1000
+        error = etapa.get("error")
+        if categoria == "api":
+            accion = etapa.get("accion", "")
+            self.api_latencia.observar(segundos, accion)
+            if error:
+                self.api_errores.sumar(accion, error)
+            elif etapa.get("status", 200) >= 400:
+                self.api_errores.sumar(accion, f"HTTP {etapa['status']}")
+            return
+
+        self.etapa_duracion.observar(segundos, categoria, nombre)
+        if error:
+            self.etapa_errores.sumar(categoria, nombre, error)
+        if nombre in ETAPAS_CACHE and "cache" in etapa:
+            self.cache_consultas.sumar(nombre, etapa["cache"])
+        if categoria == "datos" and "filas" in etapa:
+            self.filas_cargadas.observar(etapa["filas"], nombre)
+
+    def texto(self):
+        lineas = []
+        with self.bloqueo:
+            for metrica in self.metricas:
+                lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+                lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+                lineas.extend(metrica.lineas())
+        return "\n".join(lineas) + "\n"
+
+    def escribir(self, ruta):
+        # Escritura atómica para que el recolector nunca lea un fichero a medias. Cada
+        # escritura usa su propio temporal y el bloqueo evita que dos reruns (hilos
+        # distintos) se pisen; un fallo de disco no debe romper la página.
+        texto = self.texto()
+        with self.bloqueo_fichero:
+            temporal = None
+            try:
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(ruta)),
+                                                 prefix=f".{os.path.basename(ruta)}.", delete=False) as f:
+                    temporal = f.name
+                    f.write(texto)
+                os.replace(temporal, ruta)
+            except OSError:
+                if temporal:
+                    with contextlib.suppress(OSError):
+                        os.remove(temporal)
+                return False
+        return True
+
+
+REGISTRO = RegistroMetricas()
+_servidor = None
+_publicacion_intentada = False
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        cuerpo = REGISTRO.texto().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def publicar_metricas(puerto=None, host="127.0.0.1"):
+    # Una sola vez por proceso (aunque falle): el servidor HTTP vive en un hilo aparte
+    global _servidor, _publicacion_intentada
+    puerto = puerto or os.environ.get("SEMAFORO_METRICAS_PUERTO")
+    if _publicacion_intentada or not puerto:
+        return _servidor
+    _publicacion_intentada = True
+    _servidor = ThreadingHTTPServer((host, int(puerto)), _ManejadorMetricas)
+    threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+    return _servidor
+
+
+def registrar_rerun(datos):
+    REGISTRO.registrar_rerun(datos)
+    ruta = os.environ.get("SEMAFORO_METRICAS_FICHERO")
+    if ruta:
+        REGISTRO.escribir(ruta)
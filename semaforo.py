@@ -0,0 +1,506 @@
+# --- MOTOR DEL SEMÁFORO ---
+# Funciones de datos puras (sin Streamlit) para calcular el semáforo de los clientes
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from calendario import calendario_laboral, dias_habiles_serie
+from tiempos import cronometrado
+
+# --- ESTRUCTURA BASE DE LA TABLA DE CLIENTES ---
+COLUMNAS_BASE = [
+    "CAL", "COMERCIAL", "CLIENTE", "DIA", "SEMAFORO",
+    "FECHA_ENTRADA", "ASIGNADO_CLOSER", "FECHA_ASIGNACION_CLOSER",
+    "ASIGNADO_SUPERCLOSER", "FECHA_ASIGNACION_SUPERCLOSER",
+    "ESTADO_CIERRE", "SEGUIMIENTO_CLOSER", "SEGUIMIENTO_SUPERCLOSER",
+    "F2025", "F2026", "HL",
+    "CLOSER_F2025", "CLOSER_F2026", "CLOSER_HL",
+    "SUPERCLOSER_F2025", "SUPERCLOSER_F2026", "SUPERCLOSER_HL"
+]
+
+EXCLUIDOS = ["CAL", "COMERCIAL", "CLIENTE", "DIA", "SEMAFORO", "CLOSER", "OBSERVACIONES CLOSER", "OBSERVACIONES SUPER-CLOSER", "ESTADO FINAL"]
+PRODUCTOS = [col for col in COLUMNAS_BASE if col not in EXCLUIDOS]
+
+
+# --- FLAGS DE PRODUCTO (✔/❌) COMO BITS ---
+# Cada fila lleva dos máscaras de bits (un bit por producto y etapa): FLAGS_SI con
+# los ✔ y FLAGS_NO con los ❌; sin ninguno de los dos bits, la casilla está en blanco.
+# Los emojis solo se leen al cargar y se escriben al pintar o enviar a la API.
+MARCA_SI, MARCA_NO = "✔", "❌"
+PRODUCTOS_OFERTA = ["F2025", "F2026", "HL"]
+PREFIJOS_ETAPA = {"COORDINACION": "", "CLOSER": "CLOSER_", "SUPERCLOSER": "SUPERCLOSER_"}
+COLUMNAS_FLAGS = [prefijo + p for prefijo in PREFIJOS_ETAPA.values() for p in PRODUCTOS_OFERTA]
+BIT_FLAG = {col: 1 << i for i, col in enumerate(COLUMNAS_FLAGS)}
+FLAGS_SI, FLAGS_NO = "FLAGS_SI", "FLAGS_NO"
+# Nº de bits a 1 para cada máscara posible
+_BITS_ACTIVOS = np.array([bin(i).count("1") for i in range(1 << len(COLUMNAS_FLAGS))], dtype=np.int64)
+
+
+def codificar_flags(df):
+    si = np.zeros(len(df), dtype=np.uint16)
+    no = np.zeros(len(df), dtype=np.uint16)
+    for col in COLUMNAS_FLAGS:
+        if col in df.columns:
+            valores = df[col].to_numpy(dtype=object)
+            si[valores == MARCA_SI] |= BIT_FLAG[col]
+            no[valores == MARCA_NO] |= BIT_FLAG[col]
+    return si, no
+
+
+def anadir_flags(df):
+    # Decodifica los emojis una sola vez, justo después de cargar
+    df[FLAGS_SI], df[FLAGS_NO] = codificar_flags(df)
+    return df
+
+
+def bits_flags(df):
+    # Máscaras de `df`; si aún no se han decodificado, se calculan al vuelo
+    if FLAGS_SI in df.columns and FLAGS_NO in df.columns:
+        return df[FLAGS_SI].to_numpy(dtype=np.uint16), df[FLAGS_NO].to_numpy(dtype=np.uint16)
+    return codificar_flags(df)
+
+
+def mascara_columnas(columnas):
+    # Las columnas que no son flags de producto no aportan ningún bit
+    return sum(BIT_FLAG.get(col, 0) for col in columnas)
+
+
+def contar_flags(bits, mascara):
+    return _BITS_ACTIVOS[np.asarray(bits, dtype=np.int64) & mascara]
+
+
+def flag_marcado(df, columna):
+    # Serie booleana: ✔ en `columna` para cada fila
+    si, _ = bits_flags(df)
+    return pd.Series((si & BIT_FLAG.get(columna, 0)) != 0, index=df.index)
+
+
+def valor_flag(fila, columna):
+    # "✔", "❌" o "" de una casilla, leído de los bits de la fila
+    bit = BIT_FLAG.get(columna, 0)
+    if int(fila.get(FLAGS_SI, 0)) & bit:
+        return MARCA_SI
+    if int(fila.get(FLAGS_NO, 0)) & bit:
+        return MARCA_NO
+    return ""
+
+
+def productos_marcados(fila, productos, prefijo=""):
+    # Productos con ✔ en la etapa de `prefijo` para una sola fila
+    si = int(fila.get(FLAGS_SI, 0))
+    return [p for p in productos if si & BIT_FLAG.get(prefijo + p, 0)]
+
+
+def fijar_flag(df, idx, columna, valor):
+    # Cambia una casilla (emoji y bits a la vez) para que no se desincronicen.
+    # Solo flags de oferta: el resto de PRODUCTOS son fechas y categorías sin ✔/❌
+    if columna not in BIT_FLAG:
+        raise ValueError(f"{columna} no es una casilla ✔/❌")
+    df.at[idx, columna] = valor
+    if FLAGS_SI in df.columns:
+        bit = BIT_FLAG[columna]
+        si, no = int(df.at[idx, FLAGS_SI]) & ~bit, int(df.at[idx, FLAGS_NO]) & ~bit
+        df.at[idx, FLAGS_SI] = si | (bit if valor == MARCA_SI else 0)
+        df.at[idx, FLAGS_NO] = no | (bit if valor == MARCA_NO else 0)
+
+
+def heredar_flags(df, etapa, desde):
+    # Casillas en blanco de `etapa` que pasan a ✔ si alguna etapa de `desde` tiene ✔
+    # (p. ej. el Closer parte de lo ofrecido por Coordinación). Devuelve una copia
+    si, no = bits_flags(df)
+    df = df.copy()
+    for p in PRODUCTOS_OFERTA:
+        destino = PREFIJOS_ETAPA[etapa] + p
+        origen = sum(BIT_FLAG[PREFIJOS_ETAPA[e] + p] for e in desde)
+        heredar = ((si & origen) != 0) & (((si | no) & BIT_FLAG[destino]) == 0)
+        if heredar.any():
+            if destino not in df.columns:
+                df[destino] = ""
+            df.loc[heredar, destino] = MARCA_SI
+            si = si | np.where(heredar, BIT_FLAG[destino], 0).astype(np.uint16)
+    if FLAGS_SI in df.columns:
+        df[FLAGS_SI] = si
+    return df
+
+
+# --- COLUMNAS CATEGÓRICAS ---
+# Columnas de pocos valores distintos que se guardan como Categorical con las
+# categorías ya normalizadas (sin espacios y, si toca, en mayúsculas). Los filtros
+# comparan los códigos enteros en vez de recorrer cadenas. CLIENTE queda fuera:
+# casi todos sus valores son distintos y el nombre exacto es la clave en la API.
+# columna → ¿en mayúsculas?
+COLUMNAS_CATEGORIA = {
+    "CAL": True,
+    "COMERCIAL": False,
+    "SEMAFORO": True,
+    "ASIGNADO_CLOSER": True,
+    "ASIGNADO_SUPERCLOSER": True,
+    "ESTADO_CIERRE": True,
+}
+# Categorías siempre presentes para poder asignar cualquier color celda a celda
+VALORES_SEMAFORO = ["", "VERDE", "AMARILLO", "ROJO", "AZUL - FINALIZADO"]
+
+
+def _normalizar_texto(valores, mayusculas):
+    texto = pd.Series(valores, dtype=object).fillna("").astype(str).str.strip()
+    return texto.str.upper() if mayusculas else texto
+
+
+def a_categoria(serie, mayusculas=True, fijas=()):
+    # Solo se normalizan los valores distintos; las filas se recodifican con enteros.
+    # Vacíos y NaN pasan a la categoría "", que siempre existe (fillna("") sigue valiendo)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    normalizados = _normalizar_texto(unicos, mayusculas).tolist()
+    categorias = list(dict.fromkeys(["", *fijas, *sorted(set(normalizados))]))
+    posicion = {c: i for i, c in enumerate(categorias)}
+    mapa = np.array([posicion[v] for v in normalizados] + [posicion[""]], dtype=np.int32)
+    return pd.Series(
+        pd.Categorical.from_codes(mapa[codigos], categories=categorias),
+        index=serie.index, name=serie.name
+    )
+
+
+@cronometrado()
+def normalizar_categorias(df):
+    for col, mayusculas in COLUMNAS_CATEGORIA.items():
+        if col in df.columns:
+            df[col] = a_categoria(df[col], mayusculas, VALORES_SEMAFORO if col == "SEMAFORO" else ())
+    return df
+
+
+def igual_a(serie, valor, mayusculas=True):
+    # Máscara booleana de las filas cuyo valor normalizado es `valor`
+    valor = str(valor).strip()
+    if mayusculas:
+        valor = valor.upper()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        posicion = serie.cat.categories.get_indexer([valor])[0]
+        if posicion < 0:
+            return np.zeros(len(serie), dtype=bool)
+        return serie.cat.codes.to_numpy() == posicion
+    return (_normalizar_texto(serie.to_numpy(dtype=object), mayusculas) == valor).to_numpy()
+
+
+def posiciones_por_cliente(clientes, dia_ts):
+    # Para cada fila: código de cliente (-1 si vacío), posición dentro de su bloque
+    # ordenado por DIA (NaT al final) y tamaño del bloque, en una sola ordenación
+    codigos, _ = pd.factorize(pd.Series(clientes), use_na_sentinel=True)
+    fechas = dia_ts.to_numpy(dtype="datetime64[D]")
+    vacios = np.isnat(fechas)
+    dias = fechas.view("i8").copy()
+    if len(dias) and not vacios.all():
+        dias -= dias[~vacios].min()
+    dias[vacios] = dias[~vacios].max() + 1 if not vacios.all() else 0
+
+    # Una sola clave entera (cliente, día) y una ordenación estable: igual que
+    # lexsort((dias, codigos)) pero bastante más rápido
+    orden = np.argsort(codigos.astype(np.int64) * (int(dias.max(initial=0)) + 1) + dias, kind="stable")
+    codigos_ordenados = codigos[orden]
+    inicio_bloque = np.r_[True, codigos_ordenados[1:] != codigos_ordenados[:-1]] if len(orden) else np.array([], dtype=bool)
+    indice_inicio = np.maximum.accumulate(np.where(inicio_bloque, np.arange(len(orden)), 0)) if len(orden) else orden
+
+    posicion = np.empty(len(orden), dtype=np.int64)
+    posicion[orden] = np.arange(len(orden)) - indice_inicio
+
+    tamano = np.zeros(len(orden), dtype=np.int64)
+    validos = codigos >= 0
+    tamano[validos] = np.bincount(codigos[validos])[codigos[validos]]
+    return codigos, posicion, tamano
+
+
+def dias_como_fecha(dia):
+    # DIA como datetime64. Si ya son objetos date (lo normal tras estandarizar_fechas)
+    # solo se convierten los días distintos, que son pocos, en lugar de cada fila
+    if pd.api.types.infer_dtype(dia, skipna=True) != "date":
+        return pd.to_datetime(dia, errors="coerce")
+    codigos, unicos = pd.factorize(dia, use_na_sentinel=True)
+    fechas = np.append(pd.to_datetime(unicos).to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(fechas[codigos], index=dia.index, name=dia.name)
+
+
+# Columnas que actualizar_semaforo escribe o lee como texto: solo en ellas se cambia NaN por ""
+COLUMNAS_SEMAFORO = ["CLIENTE", "DIA", "SEMAFORO"]
+
+
+def _rellenar_vacios(df):
+    for col in COLUMNAS_SEMAFORO:
+        if col in df.columns and df[col].hasnans:
+            df[col] = df[col].fillna("")
+    return df
+
+
+@cronometrado()
+def actualizar_semaforo(df, productos, hoy=None):
+    if hoy is None:
+        hoy = datetime.now().date()
+    df = df.copy(deep=False)
+
+    # ✅ Asegurar que la columna DIA existe y es de tipo date (ya lo es tras estandarizar_fechas)
+    if "DIA" not in df.columns:
+        df["DIA"] = pd.NaT
+    dia_ts = dias_como_fecha(df["DIA"])
+    if pd.api.types.infer_dtype(df["DIA"], skipna=True) != "date":
+        df["DIA"] = dia_ts.dt.date
+
+    if "CLIENTE" not in df.columns or df.empty:
+        return _rellenar_vacios(df)
+
+    codigos, posicion, tamano = posiciones_por_cliente(df["CLIENTE"], dia_ts)
+
+    # Sin 3 días aún no se puede evaluar
+    evaluable = tamano >= 3
+    if not evaluable.any():
+        return _rellenar_vacios(df)
+
+    si, no = bits_flags(df)
+    mascara = mascara_columnas(productos)
+    checks = np.where(evaluable, contar_flags(si, mascara), 0)
+    cruces = np.where(evaluable, contar_flags(no, mascara), 0)
+
+    vencido = (dia_ts <= pd.Timestamp(hoy)).to_numpy()
+
+    # AZUL - todos ✔ en cualquier fila del cliente
+    fila_completa = evaluable & (checks == len(productos))
+    cliente_completo = np.bincount(codigos[evaluable], weights=fila_completa[evaluable], minlength=codigos.max() + 1) > 0
+    azul = evaluable & cliente_completo[np.maximum(codigos, 0)]
+    normal = evaluable & ~azul
+
+    condiciones = [
+        azul & vencido,
+        azul & ~vencido,
+        # VERDE - 1er día con al menos 1 ✔
+        normal & vencido & (posicion == 0) & (checks >= 1),
+        # AMARILLO - 2º día con al menos 1 ❌
+        normal & vencido & (posicion == 1) & (cruces >= 1),
+        # ROJO - 3er día:
+        #     🔴 Si tiene algún ❌
+        #     🔴 O si no hay ningún ✔ (bloque en blanco también)
+        normal & vencido & (posicion == 2) & ((cruces >= 1) | (checks == 0)),
+    ]
+    valores_semaforo = ["AZUL - FINALIZADO", "", "VERDE", "AMARILLO", "ROJO"]
+
+    cambia = np.logical_or.reduce(condiciones)
+    if cambia.any():
+        if "SEMAFORO" not in df.columns:
+            df["SEMAFORO"] = np.nan
+        tipo = df["SEMAFORO"].dtype
+        if isinstance(tipo, pd.CategoricalDtype) and set(valores_semaforo) <= set(tipo.categories):
+            # Categórica (tras normalizar_categorias): se cambian solo los códigos
+            codigos_semaforo = df["SEMAFORO"].cat.codes.to_numpy(copy=True)
+            nuevos = np.select(condiciones, tipo.categories.get_indexer(valores_semaforo), default=0)
+            codigos_semaforo[cambia] = nuevos[cambia]
+            df["SEMAFORO"] = pd.Categorical.from_codes(codigos_semaforo, dtype=tipo)
+        else:
+            categorica = isinstance(tipo, pd.CategoricalDtype)
+            semaforo = df["SEMAFORO"].to_numpy(dtype=object, copy=True)
+            semaforo[cambia] = np.select(condiciones, valores_semaforo, default="")[cambia]
+            df["SEMAFORO"] = semaforo
+            if categorica:
+                df["SEMAFORO"] = a_categoria(df["SEMAFORO"], fijas=VALORES_SEMAFORO)
+
+    return _rellenar_vacios(df)
+
+
+# --- RECÁLCULO INCREMENTAL (un solo cliente) ---
+def semaforo_bloque(bloque, productos, hoy=None):
+    # Las reglas solo miran las filas del propio cliente, así que basta con su bloque.
+    # Devuelve {índice: SEMAFORO} únicamente para las filas que cambian
+    nuevo = actualizar_semaforo(bloque, productos, hoy)["SEMAFORO"] if not bloque.empty else pd.Series(dtype=object)
+    if "SEMAFORO" in bloque.columns:
+        anterior = bloque["SEMAFORO"].fillna("")
+    else:
+        anterior = pd.Series("", index=bloque.index)
+    cambios = nuevo.reindex(bloque.index).fillna("") != anterior
+    return nuevo[cambios].to_dict()
+
+
+def actualizar_semaforo_cliente(df, indices, productos, hoy=None):
+    # Recalcula en el sitio las filas `indices` (las 3 de un cliente) tras un cambio de ✔/❌
+    cambios = semaforo_bloque(df.loc[indices], productos, hoy)
+    for idx, valor in cambios.items():
+        df.at[idx, "SEMAFORO"] = valor
+    return cambios
+
+
+# --- ALTA DE CLIENTES (formulario e importación masiva) ---
+def filas_nuevo_cliente(cal, comercial, cliente, fecha_entrada, calendario):
+    # Las 3 filas de un cliente nuevo: el día de entrada y los 2 días hábiles siguientes
+    return [
+        {
+            "CAL": cal,
+            "COMERCIAL": comercial,
+            "CLIENTE": cliente,
+            "DIA": calendario.sumar_habiles(fecha_entrada, i) if i else fecha_entrada,
+            "FECHA_ENTRADA": fecha_entrada  # 🔧 Aquí va en las 3 filas
+        }
+        for i in range(3)
+    ]
+
+
+def fila_insercion(fila):
+    # Una fila de cliente en el formato que esperan insertar_cliente / insertar_clientes
+    return {
+        "CAL": fila["CAL"],
+        "COMERCIAL": fila["COMERCIAL"],
+        "CLIENTE": fila["CLIENTE"],
+        "DIA": fila["DIA"].strftime("%Y-%m-%d"),
+        "FECHA_ENTRADA": fila["FECHA_ENTRADA"].strftime("%Y-%m-%d")
+    }
+
+
+# --- FILTROS DE CARGA (los mismos parámetros que acepta accion=clientes) ---
+COLUMNA_ASIGNADO = {"CLOSER": "ASIGNADO_CLOSER", "SUPER": "ASIGNADO_SUPERCLOSER"}
+
+
+@cronometrado()
+def filtrar_clientes(df, rol=None, asignado=None, cal=None, desde=None, hasta=None, estado=None):
+    # Si el servidor ya aplicó los filtros esto no descarta nada; si los ignoró, filtra aquí
+    mascara = np.ones(len(df), dtype=bool)
+
+    columna = COLUMNA_ASIGNADO.get(rol)
+    if asignado and columna:
+        if columna not in df.columns:
+            return df.iloc[0:0]
+        mascara &= igual_a(df[columna], asignado)
+    if cal and "CAL" in df.columns:
+        mascara &= igual_a(df["CAL"], cal)
+    if estado and "ESTADO_CIERRE" in df.columns:
+        mascara &= igual_a(df["ESTADO_CIERRE"], estado)
+    if (desde or hasta) and "FECHA_ENTRADA" in df.columns:
+        entrada = pd.to_datetime(df["FECHA_ENTRADA"], errors="coerce")
+        if desde:
+            mascara &= (entrada >= pd.Timestamp(desde)).to_numpy()
+        if hasta:
+            mascara &= (entrada <= pd.Timestamp(hasta)).to_numpy()
+
+    return df if mascara.all() else df[mascara]
+
+
+# --- PAGINACIÓN POR CLIENTE ---
+def total_paginas(df, por_pagina):
+    return max(1, -(-df["CLIENTE"].nunique() // por_pagina))
+
+
+def paginar_clientes(df, pagina, por_pagina):
+    # Página `pagina` (desde 1) con `por_pagina` clientes completos, en orden de aparición
+    clientes = pd.unique(df["CLIENTE"])
+    inicio = (pagina - 1) * por_pagina
+    return df[df["CLIENTE"].isin(clientes[inicio:inicio + por_pagina])]
+
+
+# --- EDICIÓN EN TABLA (varios ✔/❌ de una vez) ---
+def productos_editables(productos):
+    # Solo los flags de oferta son casillas; el resto de PRODUCTOS son datos (fechas,
+    # asignaciones, seguimientos) que la tabla no debe sobrescribir
+    return [p for p in productos if p in BIT_FLAG]
+
+
+def tabla_edicion(df, productos):
+    # Flags como casillas (True = ✔) para un único st.data_editor; las demás
+    # columnas de producto se copian tal cual para mostrarlas en solo lectura
+    tabla = df[["CAL", "COMERCIAL", "CLIENTE", "DIA"]].copy()
+    editables = productos_editables(productos)
+    for p in productos:
+        if p in editables:
+            tabla[p] = flag_marcado(df, p)
+        else:
+            tabla[p] = df[p] if p in df.columns else ""
+    tabla["SEMAFORO"] = df["SEMAFORO"] if "SEMAFORO" in df.columns else ""
+    return tabla
+
+
+def cambios_edicion(original, editado, productos):
+    # [(índice, producto, "✔"/"❌")] de las casillas que el usuario ha cambiado
+    productos = productos_editables(productos)
+    antes = original[productos].to_numpy(dtype=bool)
+    despues = editado.loc[original.index, productos].to_numpy(dtype=bool)
+    filas, columnas = np.nonzero(antes != despues)
+    return [
+        (original.index[f], productos[c], MARCA_SI if despues[f, c] else MARCA_NO)
+        for f, c in zip(filas, columnas)
+    ]
+
+
+# --- PIPELINE DE COORDINACIÓN: normalizar → calcular → filtrar ---
+FILTROS_VACIOS = {"CAL": "", "COMERCIAL": "", "CLIENTE": "", "SEMAFORO": ""}
+
+
+@cronometrado()
+def estandarizar_fechas(df):
+    if "DIA" in df.columns:
+        df["DIA"] = pd.to_datetime(df["DIA"], errors="coerce").dt.date
+    else:
+        df["DIA"] = pd.NaT
+
+    if "FECHA_ENTRADA" in df.columns:
+        df["FECHA_ENTRADA"] = pd.to_datetime(df["FECHA_ENTRADA"], errors="coerce")
+    else:
+        df["FECHA_ENTRADA"] = pd.NaT
+
+    return df
+
+
+def normalizar_clientes(df, columnas):
+    # 🔒 Nombres de columna en mayúsculas y columnas mínimas garantizadas
+    df = df.copy()
+    df.columns = [str(col).upper().strip() for col in df.columns]
+    for col in columnas:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+@cronometrado()
+def preparar_semaforo(df, columnas, productos, festivos, hoy=None):
+    df = estandarizar_fechas(normalizar_clientes(df, columnas))
+    if FLAGS_SI not in df.columns:
+        anadir_flags(df)
+    normalizar_categorias(df)
+    df["DIAS_HABILES"] = dias_habiles_serie(df["FECHA_ENTRADA"], festivos, hoy)
+    return actualizar_semaforo(df, productos, hoy)
+
+
+@cronometrado()
+def aplicar_filtros(df, filtros, indice=None):
+    # Búsqueda por texto literal (sin expresiones regulares), sin distinguir mayúsculas.
+    # Con un busqueda.IndiceClientes construido sobre este mismo `df` no se recorre el texto
+    if indice is not None and indice.filas == len(df):
+        df = df[indice.mascara(filtros)]
+    else:
+        for col in ("CAL", "COMERCIAL", "CLIENTE"):
+            if filtros.get(col):
+                df = df[df[col].str.contains(filtros[col], case=False, regex=False, na=False)]
+    if filtros.get("SEMAFORO"):
+        df = df[df["SEMAFORO"] == filtros["SEMAFORO"]]
+    return df
+
+
+@cronometrado()
+def clientes_en_semaforo(df):
+    # Clientes dentro de sus 3 primeros días hábiles y aún sin Closer ni Supercloser
+    return df[
+        (df["DIAS_HABILES"] < 3).to_numpy() &
+        igual_a(df["ASIGNADO_CLOSER"], "") &
+        igual_a(df["ASIGNADO_SUPERCLOSER"], "")
+    ]
+
+
+# --- CLIENTES EXPIRADOS ---
+@cronometrado()
+def detectar_expirados(df, festivos, hoy=None):
+    # Clientes cuyo plazo (3 días hábiles desde su primer DIA) ya se ha cumplido.
+    # Devuelve la lista de expirados y el DataFrame sin ellos
+    if hoy is None:
+        hoy = datetime.now().date()
+    calendario = calendario_laboral(festivos)
+
+    # Tamaño y primer DIA de cada cliente en una sola agrupación (orden de aparición)
+    dia_ts = pd.to_datetime(df["DIA"], errors="coerce")
+    grupos = dia_ts.groupby(df["CLIENTE"], sort=False)
+    tamano, primer_dia = grupos.size(), grupos.min()
+
+    candidatos = primer_dia[(tamano >= 3) & primer_dia.notna()]
+    fecha_limite = calendario.sumar_habiles_array(candidatos.to_numpy(dtype="datetime64[D]"), 3)
+    clientes_eliminar = candidatos.index[fecha_limite <= np.datetime64(hoy, "D")].tolist()
+
+    return clientes_eliminar, df[~df["CLIENTE"].isin(clientes_eliminar)]
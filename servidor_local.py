@@ -0,0 +1,347 @@
+# --- SERVIDOR LOCAL QUE IMITA api_semaforo.php ---
+# Implementa el mismo protocolo "accion=..." (formulario o JSON) sobre SQLite, con
+# latencia configurable, para trabajar y hacer pruebas de carga sin la API real.
+#
+#   python servidor_local.py --puerto 8765 --clientes 30000 --latencia 80
+#   SEMAFORO_API_URL=http://127.0.0.1:8765/api_semaforo.php streamlit run app.py
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from semaforo import COLUMNAS_BASE, COLUMNA_ASIGNADO
+
+COLUMNAS_CLIENTES = COLUMNAS_BASE + ["GESTIONADO_CLOSER", "GESTIONADO_SUPER", "FECHA_ACTUALIZACION"]
+FLAGS_COORDINACION = ["F2025", "F2026", "HL"]
+USUARIOS_DEMO = [
+    {"usuario": "direccion", "contraseña": "direccion", "rol": "DIRECCION"},
+    {"usuario": "CAL01", "contraseña": "cal01", "rol": "COORDINADOR"},
+    {"usuario": "CLOSER 03", "contraseña": "closer", "rol": "CLOSER"},
+    {"usuario": "SUPER 01", "contraseña": "super", "rol": "SUPER"},
+]
+
+
+class ErrorPeticion(Exception):
+    pass
+
+
+def ahora():
+    return datetime.now().isoformat(sep=" ", timespec="microseconds")
+
+
+def columna_valida(columna):
+    # Los nombres de columna llegan del cliente: solo se aceptan los del esquema
+    if columna not in COLUMNAS_CLIENTES:
+        raise ErrorPeticion(f"columna desconocida: {columna}")
+    return f'"{columna}"'
+
+
+# --- BASE DE DATOS ---
+def crear_esquema(conexion):
+    columnas = ", ".join(f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c in COLUMNAS_CLIENTES)
+    conexion.executescript(f"""
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE IF NOT EXISTS clientes ({columnas}, PRIMARY KEY ("CLIENTE", "DIA"));
+        CREATE INDEX IF NOT EXISTS clientes_actualizacion ON clientes ("FECHA_ACTUALIZACION");
+        CREATE TABLE IF NOT EXISTS usuarios (usuario TEXT PRIMARY KEY, "contraseña" TEXT, rol TEXT);
+        CREATE TABLE IF NOT EXISTS festivos (fecha TEXT PRIMARY KEY);
+    """)
+
+
+def poblar(conexion, clientes, semilla):
+    # Datos de prueba: festivos nacionales, usuarios demo y clientes sintéticos
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    from generador import festivos_nacionales, generar_clientes
+
+    hoy = date.today()
+    festivos = festivos_nacionales(range(hoy.year - 2, hoy.year + 2))
+    with conexion:
+        conexion.executemany("INSERT OR IGNORE INTO festivos VALUES (?)", [(f.isoformat(),) for f in festivos])
+        conexion.executemany(
+            'INSERT OR IGNORE INTO usuarios VALUES (:usuario, :contraseña, :rol)', USUARIOS_DEMO
+        )
+        if clientes:
+            df = generar_clientes(clientes, hoy, festivos, semilla).fillna("")
+            df["GESTIONADO_CLOSER"] = ""
+            df["GESTIONADO_SUPER"] = ""
+            df["FECHA_ACTUALIZACION"] = ahora()
+            marcadores = ", ".join("?" for _ in COLUMNAS_CLIENTES)
+            conexion.executemany(
+                f"INSERT OR REPLACE INTO clientes VALUES ({marcadores})",
+                df[COLUMNAS_CLIENTES].itertuples(index=False, name=None),
+            )
+
+
+# --- ACCIONES ---
+def leer_festivos(db, datos):
+    return [fila[0] for fila in db.execute("SELECT fecha FROM festivos ORDER BY fecha")]
+
+
+def leer_clientes(db, datos):
+    condiciones, parametros = [], []
+    columna = COLUMNA_ASIGNADO.get(str(datos.get("rol", "")).upper())
+    if columna and datos.get("asignado"):
+        condiciones.append(f'UPPER("{columna}") = UPPER(?)')
+        parametros.append(datos["asignado"])
+    if datos.get("cal"):
+        condiciones.append('UPPER(TRIM("CAL")) = UPPER(TRIM(?))')
+        parametros.append(datos["cal"])
+    if datos.get("estado"):
+        condiciones.append('UPPER("ESTADO_CIERRE") = UPPER(?)')
+        parametros.append(datos["estado"])
+    if datos.get("desde"):
+        condiciones.append('"FECHA_ENTRADA" >= ?')
+        parametros.append(datos["desde"])
+    if datos.get("hasta"):
+        condiciones.append('"FECHA_ENTRADA" <= ?')
+        parametros.append(datos["hasta"])
+    if datos.get("actualizado_desde"):
+        condiciones.append('"FECHA_ACTUALIZACION" >= ?')
+        parametros.append(datos["actualizado_desde"])
+
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    cursor = db.execute(f'SELECT * FROM clientes {donde} ORDER BY "CLIENTE", "DIA"', parametros)
+    nombres = [d[0] for d in cursor.description]
+    return [dict(zip(nombres, fila)) for fila in cursor]
+
+
+def leer_usuarios(db, datos):
+    cursor = db.execute('SELECT usuario, "contraseña", rol FROM usuarios ORDER BY usuario')
+    return [{"usuario": u, "contraseña": c, "rol": r} for u, c, r in cursor]
+
+
+def _insertar_filas(db, filas):
+    obligatorias = ["CAL", "COMERCIAL", "CLIENTE", "DIA", "FECHA_ENTRADA"]
+    marca = ahora()
+    for fila in filas:
+        faltan = [c for c in obligatorias if not fila.get(c)]
+        if faltan:
+            raise ErrorPeticion(f"faltan campos {faltan} en {fila.get('CLIENTE', '?')}")
+        valores = {c: str(fila[c]) for c in obligatorias}
+        valores.update({p: "❌" for p in FLAGS_COORDINACION})
+        valores["FECHA_ACTUALIZACION"] = marca
+        columnas = ", ".join(columna_valida(c) for c in valores)
+        db.execute(
+            f"INSERT INTO clientes ({columnas}) VALUES ({', '.join('?' for _ in valores)})",
+            list(valores.values()),
+        )
+    return {"status": "ok", "insertados": len(filas)}
+
+
+def insertar_cliente(db, datos):
+    return _insertar_filas(db, [datos])
+
+
+def insertar_clientes(db, datos):
+    return _insertar_filas(db, datos.get("filas") or [])
+
+
+def _actualizar_fila(db, cambio):
+    producto = columna_valida(cambio["producto"])
+    cursor = db.execute(
+        f'UPDATE clientes SET {producto} = ?, "SEMAFORO" = ?, "FECHA_ACTUALIZACION" = ? WHERE "CLIENTE" = ? AND "DIA" = ?',
+        (cambio["valor"], cambio.get("semaforo", ""), ahora(), cambio["cliente"], cambio["dia"]),
+    )
+    if cursor.rowcount == 0:
+        raise ErrorPeticion(f"no existe la fila {cambio['cliente']} / {cambio['dia']}")
+
+
+def actualizar_producto(db, datos):
+    _actualizar_fila(db, datos)
+    return {"status": "ok"}
+
+
+def actualizar_productos(db, datos):
+    cambios = datos.get("cambios") or []
+    for cambio in cambios:
+        _actualizar_fila(db, cambio)
+    return {"status": "ok", "actualizados": len(cambios)}
+
+
+def _actualizar_cliente(db, cliente, valores):
+    valores = {**valores, "FECHA_ACTUALIZACION": ahora()}
+    asignaciones = ", ".join(f"{columna_valida(c)} = ?" for c in valores)
+    cursor = db.execute(
+        f'UPDATE clientes SET {asignaciones} WHERE "CLIENTE" = ?',
+        [str(v) for v in valores.values()] + [cliente],
+    )
+    if cursor.rowcount == 0:
+        raise ErrorPeticion(f"no existe el cliente {cliente}")
+    return {"status": "ok"}
+
+
+def asignar_closer(db, datos):
+    return _actualizar_cliente(db, datos["cliente"], {
+        "ASIGNADO_CLOSER": datos["closer"],
+        "FECHA_ASIGNACION_CLOSER": datos.get("fecha", date.today().isoformat()),
+    })
+
+
+def asignar_supercloser(db, datos):
+    return _actualizar_cliente(db, datos["cliente"], {
+        "ASIGNADO_SUPERCLOSER": datos["nombre"],
+        "FECHA_ASIGNACION_SUPERCLOSER": datos.get("fecha", date.today().isoformat()),
+    })
+
+
+def seguimiento_closer(db, datos):
+    return _actualizar_cliente(db, datos["cliente"], {
+        **(datos.get("productos") or {}),
+        "SEGUIMIENTO_CLOSER": datos.get("seguimiento", ""),
+        "ESTADO_CIERRE": datos.get("estado", ""),
+        "GESTIONADO_CLOSER": "1" if datos.get("gestionado") else "",
+    })
+
+
+def seguimiento_super(db, datos):
+    valores = dict(datos.get("datos") or {})
+    if "GESTIONADO_SUPER" in valores:
+        valores["GESTIONADO_SUPER"] = "1" if valores["GESTIONADO_SUPER"] else ""
+    return _actualizar_cliente(db, datos["cliente"], valores)
+
+
+def guardar_usuarios(db, datos):
+    usuarios = datos.get("usuarios") or []
+    db.execute("DELETE FROM usuarios")
+    db.executemany(
+        'INSERT INTO usuarios VALUES (?, ?, ?)',
+        [(u["usuario"], str(u.get("contraseña", "")), str(u.get("rol", "")).upper()) for u in usuarios if u.get("usuario")],
+    )
+    return {"status": "ok"}
+
+
+def nuevo_usuario(db, datos):
+    if not datos.get("usuario"):
+        raise ErrorPeticion("falta el usuario")
+    db.execute(
+        'INSERT OR REPLACE INTO usuarios VALUES (?, ?, ?)',
+        (datos["usuario"], datos.get("contraseña", ""), str(datos.get("rol", "")).upper()),
+    )
+    return {"status": "ok"}
+
+
+def borrar_usuario(db, datos):
+    db.execute("DELETE FROM usuarios WHERE usuario = ?", (datos.get("usuario"),))
+    return {"status": "ok"}
+
+
+ACCIONES = {
+    "festivos": leer_festivos,
+    "clientes": leer_clientes,
+    "usuarios": leer_usuarios,
+    "insertar_cliente": insertar_cliente,
+    "insertar_clientes": insertar_clientes,
+    "actualizar_producto": actualizar_producto,
+    "actualizar_productos": actualizar_productos,
+    "asignar_closer": asignar_closer,
+    "asignar_supercloser": asignar_supercloser,
+    "seguimiento_closer": seguimiento_closer,
+    "seguimiento_super": seguimiento_super,
+    "guardar_usuarios": guardar_usuarios,
+    "nuevo_usuario": nuevo_usuario,
+    "borrar_usuario": borrar_usuario,
+}
+
+
+# --- HTTP ---
+class ServidorLocal(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, ruta_db, latencia=0.0, variacion=0.0):
+        super().__init__(direccion, ManejadorAPI)
+        self.ruta_db = ruta_db
+        self.latencia = latencia
+        self.variacion = variacion
+        self.verboso = False
+        with self.conectar() as conexion:
+            crear_esquema(conexion)
+
+    def conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        conexion.execute("PRAGMA busy_timeout = 30000")
+        return conexion
+
+    @property
+    def url(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}/api_semaforo.php"
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            datos = self.decodificar(cuerpo)
+            accion = ACCIONES.get(datos.get("accion"))
+            if accion is None:
+                raise ErrorPeticion(f"accion desconocida: {datos.get('accion')}")
+
+            espera = self.server.latencia + random.uniform(0, self.server.variacion)
+            if espera:
+                time.sleep(espera)
+
+            conexion = self.server.conectar()
+            try:
+                # Cada petición es una transacción: o se aplica entera o nada
+                with conexion:
+                    resultado = accion(conexion, datos)
+            finally:
+                conexion.close()
+            self.responder(200, resultado)
+        except (ErrorPeticion, KeyError, sqlite3.IntegrityError, ValueError) as e:
+            self.responder(400, {"status": "error", "mensaje": str(e)})
+
+    def decodificar(self, cuerpo):
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(cuerpo or b"{}")
+        return {k: v[-1] for k, v in parse_qs(cuerpo.decode("utf-8")).items()}
+
+    def responder(self, codigo, datos):
+        salida = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(salida)))
+        self.end_headers()
+        self.wfile.write(salida)
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con api_semaforo.php")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--db", default="servidor_local.sqlite3", help="fichero SQLite")
+    parser.add_argument("--clientes", type=int, default=0, help="filas sintéticas a generar al arrancar")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--latencia", type=float, default=0, help="milisegundos añadidos a cada petición")
+    parser.add_argument("--variacion", type=float, default=0, help="milisegundos aleatorios extra (0..variacion)")
+    parser.add_argument("--verboso", action="store_true")
+    args = parser.parse_args()
+
+    servidor = ServidorLocal((args.host, args.puerto), args.db, args.latencia / 1000, args.variacion / 1000)
+    servidor.verboso = args.verboso
+    with servidor.conectar() as conexion:
+        poblar(conexion, args.clientes, args.semilla)
+
+    print(f"🚦 API local en {servidor.url} (db: {args.db})")
+    print(f"   SEMAFORO_API_URL={servidor.url} streamlit run app.py")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
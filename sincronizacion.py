@@ -0,0 +1,78 @@
+# --- SINCRONIZACIÓN INCREMENTAL DE CLIENTES ---
+# Copia local de la tabla de clientes que solo pide a la API las filas
+# modificadas desde la última marca (accion=clientes&actualizado_desde=...).
+# Los deltas no traen las filas borradas en el servidor, así que cada
+# RECARGA_COMPLETA segundos se vuelve a pedir la tabla entera.
+import threading
+import time
+
+import pandas as pd
+
+# Cada fila queda identificada por el cliente y su día del semáforo
+CLAVE_FILA = ["CLIENTE", "DIA"]
+# Columna con la fecha/hora de última modificación que devuelve la API
+COLUMNA_VERSION = "FECHA_ACTUALIZACION"
+# Segundos entre cargas completas (para que desaparezcan las filas borradas)
+RECARGA_COMPLETA = 15 * 60
+
+
+def fusionar_clientes(base, cambios, clave=CLAVE_FILA):
+    # Las filas de `cambios` sustituyen a las de `base` con la misma clave
+    if base is None or base.empty:
+        return cambios.reset_index(drop=True)
+    if cambios.empty:
+        return base
+    combinado = pd.concat([base, cambios], ignore_index=True)
+    return combinado.drop_duplicates(clave, keep="last").reset_index(drop=True)
+
+
+def marca_version(df, anterior=None):
+    if COLUMNA_VERSION not in df.columns:
+        return anterior
+    maxima = pd.to_datetime(df[COLUMNA_VERSION], errors="coerce").max()
+    if pd.isna(maxima):
+        return anterior
+    if anterior is not None and pd.Timestamp(anterior) >= maxima:
+        return anterior
+    return maxima.isoformat(sep=" ")
+
+
+class InstantaneaClientes:
+    def __init__(self, api, recarga_completa=RECARGA_COMPLETA):
+        self.api = api
+        self.recarga_completa = recarga_completa
+        self.df = None
+        self.marca = None
+        self.ultima_completa = None
+        self.bloqueo = threading.Lock()
+
+    @property
+    def cargada(self):
+        return self.df is not None
+
+    def _toca_completa(self):
+        if self.df is None or self.marca is None:
+            return True
+        return time.monotonic() - self.ultima_completa >= self.recarga_completa
+
+    def sincronizar(self):
+        with self.bloqueo:
+            if self._toca_completa():
+                # Primera carga, servidor sin soporte de versiones o recarga periódica
+                # para quitar las filas borradas: tabla completa
+                self.df = pd.DataFrame(self.api.consultar("clientes"))
+                self.marca = marca_version(self.df)
+                self.ultima_completa = time.monotonic()
+            else:
+                # La marca es inclusiva: las filas repetidas se deduplican al fusionar
+                cambios = pd.DataFrame(self.api.consultar("clientes", actualizado_desde=self.marca))
+                if cambios.empty:
+                    pass
+                elif COLUMNA_VERSION not in cambios.columns:
+                    # El servidor ignoró el parámetro y devolvió la tabla entera
+                    self.df = cambios
+                    self.ultima_completa = time.monotonic()
+                else:
+                    self.df = fusionar_clientes(self.df, cambios)
+                self.marca = marca_version(cambios, self.marca)
+            return self.df.copy()
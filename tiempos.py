@@ -0,0 +1,176 @@
+# --- TIEMPOS POR RERUN ---
+# Cada rerun de la app abre una medición; las llamadas a la API, las etapas de
+# datos y los bloques de pintado que se ejecutan dentro quedan anotados con su
+# inicio y duración. Al terminar se escribe una línea JSON en el registro.
+#
+#   SEMAFORO_LOG_TIEMPOS=tiempos.jsonl streamlit run app.py   (por defecto, stderr)
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import metricas
+
+registro = logging.getLogger("semaforo.tiempos")
+
+_medicion_actual = contextvars.ContextVar("medicion_actual", default=None)
+
+
+def configurar_registro(destino=None):
+    # Una sola vez por proceso: Streamlit vuelve a importar la app en cada rerun
+    if registro.handlers:
+        return
+    destino = destino or os.environ.get("SEMAFORO_LOG_TIEMPOS", "")
+    manejador = logging.FileHandler(destino, encoding="utf-8") if destino else logging.StreamHandler(sys.stderr)
+    manejador.setFormatter(logging.Formatter("%(message)s"))
+    registro.addHandler(manejador)
+    registro.setLevel(logging.INFO)
+    registro.propagate = False
+
+
+class MedicionRerun:
+    def __init__(self, **etiquetas):
+        self.etiquetas = etiquetas
+        self.fecha = datetime.now().isoformat(timespec="milliseconds")
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.abiertas = []
+        self.total_ms = None
+
+    def etiquetar(self, **etiquetas):
+        self.etiquetas.update({k: v for k, v in etiquetas.items() if v is not None})
+
+    @contextmanager
+    def etapa(self, nombre, categoria, **extra):
+        inicio = time.perf_counter()
+        registro_etapa = {
+            "etapa": nombre,
+            "categoria": categoria,
+            "nivel": len(self.abiertas),
+            "inicio_ms": round((inicio - self.inicio) * 1000, 3),
+            **extra,
+        }
+        # Se añade al empezar para que el orden sea el de entrada (cascada)
+        self.etapas.append(registro_etapa)
+        self.abiertas.append(registro_etapa)
+        try:
+            yield registro_etapa
+        except BaseException as e:
+            registro_etapa["error"] = type(e).__name__
+            raise
+        finally:
+            self.abiertas.pop()
+            registro_etapa["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+
+    def finalizar(self, tarde=False, **extra):
+        # tarde=True: se cierra desde el rerun siguiente y el reloj incluiría el tiempo
+        # que el usuario estuvo sin hacer nada; se usa el final de la última etapa y
+        # metricas.py no lo cuenta en el histograma de duración
+        if self.total_ms is None:
+            if tarde:
+                self.total_ms = round(max((e["inicio_ms"] + e.get("duracion_ms", 0.0) for e in self.etapas), default=0.0), 3)
+                extra["cerrado_tarde"] = True
+            else:
+                self.total_ms = round((time.perf_counter() - self.inicio) * 1000, 3)
+            datos = self.como_dict(**extra)
+            registro.info(json.dumps(datos, ensure_ascii=False, default=str))
+            metricas.registrar_rerun(datos)
+        return self
+
+    def como_dict(self, **extra):
+        return {
+            "fecha": self.fecha,
+            **self.etiquetas,
+            **extra,
+            "total_ms": self.total_ms,
+            "etapas": self.etapas,
+        }
+
+
+def iniciar_rerun(**etiquetas):
+    medicion = MedicionRerun(**etiquetas)
+    _medicion_actual.set(medicion)
+    return medicion
+
+
+def medicion_actual():
+    return _medicion_actual.get()
+
+
+def finalizar_rerun(**extra):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.finalizar(**extra)
+    return medicion
+
+
+def anotar(**datos):
+    # Añade datos a la etapa abierta más interna (p. ej. cache="fallo" desde una función cacheada)
+    medicion = _medicion_actual.get()
+    if medicion is not None and medicion.abiertas:
+        medicion.abiertas[-1].update(datos)
+
+
+@contextmanager
+def medir(nombre, categoria="datos", **extra):
+    # Fuera de un rerun (benchmarks, servidor local) no se anota nada
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        yield {}
+        return
+    with medicion.etapa(nombre, categoria, **extra) as registro_etapa:
+        yield registro_etapa
+
+
+def cronometrado(nombre=None, categoria="datos"):
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _medicion_actual.get() is None:
+                return funcion(*args, **kwargs)
+            with medir(etiqueta, categoria):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+COLORES_CATEGORIA = {"api": "#1f77b4", "datos": "#ff7f0e", "render": "#2ca02c"}
+
+
+def filas_cascada(medicion):
+    # Una fila por etapa con su posición relativa (0-100 %) dentro del rerun
+    total = medicion.total_ms or round((time.perf_counter() - medicion.inicio) * 1000, 3)
+    filas = []
+    for etapa in medicion.etapas:
+        duracion = etapa.get("duracion_ms", 0.0)
+        filas.append({
+            "etapa": etapa["etapa"],
+            "categoria": etapa["categoria"],
+            "nivel": etapa["nivel"],
+            "inicio_ms": etapa["inicio_ms"],
+            "duracion_ms": duracion,
+            "desde_pct": 100 * etapa["inicio_ms"] / total if total else 0.0,
+            "ancho_pct": 100 * duracion / total if total else 0.0,
+        })
+    return filas, total
+
+
+def totales_por_categoria(medicion):
+    # Solo cuentan las etapas de primer nivel de cada categoría para no sumar dos veces
+    totales = {}
+    for etapa in medicion.etapas:
+        padre = any(
+            otra["categoria"] == etapa["categoria"] and otra["nivel"] < etapa["nivel"]
+            and otra["inicio_ms"] <= etapa["inicio_ms"] < otra["inicio_ms"] + otra.get("duracion_ms", 0.0)
+            for otra in medicion.etapas
+        )
+        if not padre:
+            totales[etapa["categoria"]] = totales.get(etapa["categoria"], 0.0) + etapa.get("duracion_ms", 0.0)
+    return {k: round(v, 3) for k, v in totales.items()}